@@ -0,0 +1,62 @@
+import asyncio
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from ai_commander.inference import InferenceService, LocalClient, MoveSuggester
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+from ai_commander.tools.map_generator import RandomMapGenerator
+
+MAP_SIZE = 60
+UNITS = 300
+TURNS = 20
+SEED = 95
+
+
+async def plan_turns(service, turns):
+    client = LocalClient(service)
+    for requests in turns:
+        await client.suggest_many(requests)
+
+
+if __name__ == "__main__":
+    random.seed(SEED)
+    with tempfile.TemporaryDirectory() as output_base, redirect_stdout(StringIO()):
+        map_data = RandomMapGenerator(width=MAP_SIZE, height=MAP_SIZE).generate(output_base)[1]
+    mcg = MovementCostGraphBuilder(map_data).build_graph()
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(mcg).eval()
+
+    hex_ids = sorted(mcg["INF"])
+    turns = []
+    for _ in range(TURNS):
+        turn = []
+        for _ in range(UNITS):
+            path = [random.choice(hex_ids)]
+            for _ in range(random.randint(0, 8)):
+                path.append(random.choice(sorted(mcg["INF"][path[-1]])))
+            turn.append((path, random.choice(hex_ids), "INF"))
+        turns.append(turn)
+
+    start = time.perf_counter()
+    for turn in turns:
+        for path, goal, unit_type in turn:
+            model(path, goal, mcg, unit_type)
+    elapsed = time.perf_counter() - start
+    print(f"per-unit forward: {UNITS * TURNS / elapsed:>9.0f} requests/s")
+
+    for max_delay in (0.0005, 0.002, 0.01):
+        service = InferenceService(MoveSuggester(model, mcg), max_batch_size=512, max_delay=max_delay)
+
+        async def run():
+            async with service:
+                await plan_turns(service, turns)
+                return service.stats.report()
+
+        report = asyncio.run(run())
+        print(
+            f"service {max_delay * 1000:>4.1f}ms window: {report['throughput']:>9.0f} requests/s, "
+            f"mean batch {report['mean_batch']:.0f}, p50 {report['p50_ms']:.1f}ms, p99 {report['p99_ms']:.1f}ms"
+        )
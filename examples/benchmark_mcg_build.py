@@ -0,0 +1,37 @@
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.tools.map_generator import RandomMapGenerator
+
+MAP_SIZES = [10, 50, 100, 200, 300]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def generate_map(size):
+    with tempfile.TemporaryDirectory() as output_base, redirect_stdout(StringIO()):
+        return RandomMapGenerator(width=size, height=size).generate(output_base)[1]
+
+
+if __name__ == "__main__":
+    random.seed(95)
+    print(f"{'map':>9} {'edges':>9} {'build_graph':>12} {'vectorized':>12} {'compact':>10} {'speedup':>8}")
+    for size in MAP_SIZES:
+        builder = MovementCostGraphBuilder(generate_map(size))
+
+        graph, loop_time = timed(builder.build_graph)
+        vectorized, vectorized_time = timed(builder.build_graph_vectorized)
+        compact, compact_time = timed(builder.build_compact)
+        assert vectorized == graph, f"vectorized graph differs on {size}x{size}"
+
+        edges = sum(len(unit.neighbors) for unit in compact.units.values())
+        print(f"{size:>4}x{size:<4} {edges:>9} {loop_time:>11.3f}s {vectorized_time:>11.3f}s "
+              f"{compact_time:>9.3f}s {loop_time / compact_time:>7.1f}x")
@@ -0,0 +1,40 @@
+import os
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+from ai_commander.PlayerPathDataset import PlayerPathDataset
+from ai_commander.tools.map_generator import RandomMapGenerator
+from ai_commander.tools.path_generator import PathGenerator
+
+MAP_SIZE = 40
+PAIR_COUNT = 5_000
+BATCH_SIZE = 64
+SEED = 95
+
+if __name__ == "__main__":
+    random.seed(SEED)
+    with tempfile.TemporaryDirectory() as output_base:
+        with redirect_stdout(StringIO()):
+            map_data = RandomMapGenerator(width=MAP_SIZE, height=MAP_SIZE).generate(output_base)[1]
+            MovementCostGraphBuilder(map_data).save_compact(output_base)
+        generator = PathGenerator(os.path.join(output_base, "mcg.bin"), unit_type="INF")
+        hex_ids = list(map_data["hexes"])
+        pairs = [(random.choice(hex_ids), random.choice(hex_ids)) for _ in range(PAIR_COUNT)]
+        paths = [path for path in generator.find_paths(pairs, rng=random.Random(SEED)) if path]
+        dataset = PlayerPathDataset(paths, MovementCostGraphBuilder(map_data).build_graph())
+
+        cores = os.cpu_count() or 1
+        baseline = None
+        for world_size in sorted({1, 2, cores} & set(range(1, cores + 1))):
+            model = ManueverabilityFirstLayerMapTensor.from_mcg(dataset.mcg)
+            start = time.perf_counter()
+            with redirect_stdout(StringIO()):
+                model.train_mflmt(dataset, epochs=1, batch_size=BATCH_SIZE, model_dir=output_base, world_size=world_size)
+            rate = len(dataset) / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print(f"{world_size:>3} ranks: {rate:>9.0f} samples/s ({rate / baseline:.2f}x)")
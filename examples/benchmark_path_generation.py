@@ -0,0 +1,34 @@
+import os
+import random
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.tools.map_generator import RandomMapGenerator
+from ai_commander.tools.path_generator import PathGenerator
+
+MAP_SIZE = 60
+PAIR_COUNT = 20_000
+SEED = 95
+
+if __name__ == "__main__":
+    random.seed(SEED)
+    with tempfile.TemporaryDirectory() as output_base:
+        with redirect_stdout(StringIO()):
+            map_data = RandomMapGenerator(width=MAP_SIZE, height=MAP_SIZE).generate(output_base)[1]
+            MovementCostGraphBuilder(map_data).save_compact(output_base)
+        generator = PathGenerator(os.path.join(output_base, "mcg.bin"), unit_type="INF")
+
+        hex_ids = list(map_data["hexes"])
+        pairs = [(random.choice(hex_ids), random.choice(hex_ids)) for _ in range(PAIR_COUNT)]
+
+        reference = None
+        for workers in sorted({1, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            paths = [path for _, shard in generator.iter_shards(pairs, workers=workers, seed=SEED) for path in shard]
+            elapsed = time.perf_counter() - start
+            reference = reference or paths
+            assert paths == reference, "paths must not depend on the number of workers"
+            print(f"{workers:>3} workers: {PAIR_COUNT / elapsed:>9.0f} paths/s ({elapsed:.2f}s)")
@@ -0,0 +1,75 @@
+import os
+import random
+import tempfile
+import time
+import warnings
+from contextlib import redirect_stderr, redirect_stdout
+from io import StringIO
+
+import torch
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+from ai_commander.pathfinding import AStarPathfinder
+from ai_commander.PlayerPathDataset import PlayerPathDataset, collate_paths
+from ai_commander.quantization import accuracy_drift, load_quantized, model_size
+from ai_commander.tools.map_generator import RandomMapGenerator
+
+MAP_SIZE = 60
+EMBEDDING_DIM = 64
+TRAIN_PATHS = 3_000
+HELD_OUT_PATHS = 500
+BATCH_SIZE = 256
+REPEATS = 200
+SEED = 95
+
+
+def path_dataset(mcg, count, rng):
+    finder = AStarPathfinder(mcg, "INF")
+    hex_ids = sorted(mcg["INF"])
+    paths = [finder.find_path(rng.choice(hex_ids), rng.choice(hex_ids), rng=rng, noise=0.3) for _ in range(count)]
+    return PlayerPathDataset([path for path in paths if path], mcg, unit_type="INF")
+
+
+def per_call_ms(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore")
+    random.seed(SEED)
+    torch.manual_seed(SEED)
+    with tempfile.TemporaryDirectory() as output_base:
+        with redirect_stdout(StringIO()):
+            map_data = RandomMapGenerator(width=MAP_SIZE, height=MAP_SIZE).generate(output_base)[1]
+        mcg = MovementCostGraphBuilder(map_data).build_graph()
+        rng = random.Random(SEED)
+        train, held_out = path_dataset(mcg, TRAIN_PATHS, rng), path_dataset(mcg, HELD_OUT_PATHS, rng)
+
+        model = ManueverabilityFirstLayerMapTensor.from_mcg(mcg, EMBEDDING_DIM)
+        with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+            model.train_mflmt(train, epochs=3, model_dir=output_base)
+        model.eval()
+        quantized = load_quantized(os.path.join(output_base, "mflmt.pt"), mcg=mcg)
+
+    neighbors, neighbor_mask = model.neighbor_table(mcg, "INF")
+    context, lengths, _, target = collate_paths([held_out[i] for i in range(BATCH_SIZE)])
+    path, _, goal = held_out.hex_sample(0)
+
+    print(f"{'':>10} {'size':>10} {'batch of ' + str(BATCH_SIZE):>14} {'single call':>12}")
+    for name, candidate in (("float32", model), ("int8", quantized)):
+        with torch.inference_mode():
+            batch_ms = per_call_ms(lambda: candidate.forward_batch(context, lengths, target, neighbors, neighbor_mask))
+            single_ms = per_call_ms(lambda: candidate(path, goal, mcg, "INF"))
+        print(f"{name:>10} {model_size(candidate) / 1024:>8.1f}kB {batch_ms:>12.3f}ms {single_ms:>10.3f}ms")
+
+    drift = accuracy_drift(model, quantized, held_out)
+    print(
+        f"held-out {drift['samples']} samples: accuracy {drift['reference_accuracy']:.3f} -> "
+        f"{drift['quantized_accuracy']:.3f}, top-1 agreement {drift['top1_agreement']:.3f}, "
+        f"max prob diff {drift['max_prob_diff']:.4f}, mean KL {drift['mean_kl']:.2e}"
+    )
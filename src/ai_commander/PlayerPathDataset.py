@@ -1,28 +1,229 @@
-from torch.utils.data import Dataset
-import random
+from array import array
+from collections import OrderedDict
+import os
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset, Sampler
+
+from ai_commander.compact_mcg import as_compact, load_mcg
+from ai_commander.distance_fields import padded_edges
+from ai_commander.tools.path_corpus import PathCorpusReader
+
 
 class PlayerPathDataset(Dataset):
-    def __init__(self, paths, mcg, unit_type="INF"):
+    def __init__(self, paths, mcg, unit_type="INF", hex_ids=None):
         """
-        paths: List[List[str]] - każda lista to ścieżka gracza
+        paths: Iterable[List[str]] - każda lista to ścieżka gracza (np. PathCorpusReader)
         mcg: movement cost graph
+        hex_ids: kolejność heksów (domyślnie heksy MCG, jak w ``from_mcg`` modelu)
+
+        Paths are stored once, as hex indices in a flat int32 array with
+        offsets; a sample is a ``(path_id, position)`` pair sliced on access.
         """
-        self.samples = []
         self.mcg = mcg
         self.unit_type = unit_type
+        self.hex_ids = list(hex_ids) if hex_ids is not None else as_compact(mcg).hex_ids
+        self.hex_index = {hex_id: i for i, hex_id in enumerate(self.hex_ids)}
 
+        hexes = array("i")
+        offsets = array("q", [0])
         for path in paths:
-            if len(path) < 4:
-                continue
-            for i in range(2, len(path) - 1):
-                masked = path[i]
-                context = path[:i]
-                target = path[-1]
-                self.samples.append((context, masked, target))
+            hexes.extend(self.hex_index[hex_id] for hex_id in path)
+            offsets.append(len(hexes))
+        self.hexes = np.frombuffer(hexes, dtype=np.int32) if len(hexes) else np.zeros(0, dtype=np.int32)
+        self.offsets = np.frombuffer(offsets, dtype=np.int64)
+
+        # Próbka: maskujemy heks na pozycji 2..len-2, kontekst to wszystko przed nim
+        path_lengths = np.diff(self.offsets)
+        counts = np.maximum(path_lengths - 3, 0)
+        self.sample_paths = np.repeat(np.arange(len(path_lengths), dtype=np.int32), counts)
+        starts = np.cumsum(counts) - counts
+        self.sample_positions = (np.arange(counts.sum()) - np.repeat(starts, counts) + 2).astype(np.int32)
 
     def __len__(self):
-        return len(self.samples)
+        return len(self.sample_paths)
 
     def __getitem__(self, idx):
-        context, masked, target = self.samples[idx]
-        return context, masked, target
\ No newline at end of file
+        """``(context, masked, target)`` as hex indices; ``context`` is a view into the flat array"""
+        start = self.offsets[self.sample_paths[idx]]
+        end = self.offsets[self.sample_paths[idx] + 1]
+        position = start + self.sample_positions[idx]
+        return self.hexes[start:position], int(self.hexes[position]), int(self.hexes[end - 1])
+
+    def hex_sample(self, idx):
+        """The same sample as hex ids, as the model's ``forward`` takes them"""
+        context, masked, target = self[idx]
+        return [self.hex_ids[i] for i in context.tolist()], self.hex_ids[masked], self.hex_ids[target]
+
+    def context_lengths(self):
+        return self.sample_positions
+
+
+def collate_paths(batch):
+    """Padded ``(context [B, L], lengths [B], masked [B], target [B])`` long tensors; padding is 0"""
+    lengths = torch.tensor([len(context) for context, _, _ in batch], dtype=torch.long)
+    context = torch.zeros((len(batch), int(lengths.max()) if len(batch) else 0), dtype=torch.long)
+    for row, (path, _, _) in enumerate(batch):
+        context[row, :len(path)] = torch.from_numpy(np.asarray(path, dtype=np.int64))
+    masked = torch.tensor([m for _, m, _ in batch], dtype=torch.long)
+    target = torch.tensor([t for _, _, t in batch], dtype=torch.long)
+    return context, lengths, masked, target
+
+
+class LengthBucketSampler(Sampler):
+    """Batches of samples with similar context lengths, so little compute goes to padding.
+
+    Indices are shuffled, cut into buckets of ``bucket_batches`` batches,
+    sorted by length inside each bucket and split into batches; the batch
+    order is shuffled again every epoch.
+
+    For distributed training every rank builds the same batches (same
+    ``seed``) and keeps every ``world_size``-th one from ``rank`` on; the
+    last few batches are dropped so all ranks take the same number of steps.
+    """
+
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_batches=50, seed=None, rank=0, world_size=1):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_size = batch_size * bucket_batches
+        self.rng = np.random.default_rng(seed)
+        self.rank = rank
+        self.world_size = world_size
+
+    def __iter__(self):
+        count = len(self.lengths)
+        indices = self.rng.permutation(count) if self.shuffle else np.arange(count)
+        batches = []
+        for start in range(0, count, self.bucket_size):
+            bucket = indices[start:start + self.bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind="stable")]
+            batches.extend(bucket[i:i + self.batch_size].tolist() for i in range(0, len(bucket), self.batch_size))
+        if self.shuffle:
+            batches = [batches[i] for i in self.rng.permutation(len(batches))]
+        if self.world_size > 1:
+            batches = batches[:len(batches) // self.world_size * self.world_size][self.rank::self.world_size]
+        return iter(batches)
+
+    def __len__(self):
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size // self.world_size
+
+
+class MultiMapPathDataset(Dataset):
+    """Player paths from many generated maps, without loading every map up front.
+
+    Every directory holds an MCG (``mcg.bin`` or ``mcg.json``) and a binary
+    path corpus ``{corpus_name}.bin`` from ``PathGenerator.stream_paths``.
+    Only path lengths are read while indexing; corpora, MCGs and neighbor
+    tensors are loaded on first use and kept in an LRU cache of
+    ``cache_size`` maps. Samples are ``(map_id, context, masked, target)``
+    with hexes as indices into that map's ``hex_ids``.
+    """
+
+    def __init__(self, map_dirs, unit_type="INF", corpus_name="paths", cache_size=8):
+        self.map_dirs = [str(map_dir) for map_dir in map_dirs]
+        self.unit_type = unit_type
+        self.corpus_name = corpus_name
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.loads = 0
+
+        # Na mapę: skumulowana liczba próbek po ścieżkach
+        self.path_sample_offsets = []
+        map_counts = []
+        for map_dir in self.map_dirs:
+            reader = PathCorpusReader(os.path.join(map_dir, corpus_name))
+            path_lengths = reader.path_lengths()
+            counts = np.maximum(path_lengths - 3, 0)
+            offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            self.path_sample_offsets.append(offsets)
+            map_counts.append(int(offsets[-1]))
+        self.map_sample_offsets = np.zeros(len(map_counts) + 1, dtype=np.int64)
+        np.cumsum(map_counts, out=self.map_sample_offsets[1:])
+
+    def __len__(self):
+        return int(self.map_sample_offsets[-1])
+
+    def locate(self, idx):
+        """``(map_id, path_id, position)`` of a sample"""
+        map_id = int(np.searchsorted(self.map_sample_offsets, idx, side="right")) - 1
+        local = idx - self.map_sample_offsets[map_id]
+        offsets = self.path_sample_offsets[map_id]
+        path_id = int(np.searchsorted(offsets, local, side="right")) - 1
+        return map_id, path_id, int(local - offsets[path_id]) + 2
+
+    def load_map(self, map_id):
+        """Corpus, MCG and ``[N, K]`` neighbor tensors of a map, through the LRU cache"""
+        if map_id in self.cache:
+            self.cache.move_to_end(map_id)
+            return self.cache[map_id]
+
+        map_dir = self.map_dirs[map_id]
+        graph_path = os.path.join(map_dir, "mcg.bin")
+        if not os.path.exists(graph_path):
+            graph_path = os.path.join(map_dir, "mcg.json")
+        mcg = as_compact(load_mcg(graph_path))
+        neighbors, costs = padded_edges(mcg.unit(self.unit_type), mcg.num_hexes)
+        entry = {
+            "corpus": PathCorpusReader(os.path.join(map_dir, self.corpus_name)),
+            "mcg": mcg,
+            "neighbors": torch.from_numpy(neighbors),
+            "neighbor_mask": torch.from_numpy(np.isfinite(costs)),
+        }
+        self.cache[map_id] = entry
+        self.loads += 1
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return entry
+
+    def __getitem__(self, idx):
+        map_id, path_id, position = self.locate(idx)
+        entry = self.load_map(map_id)
+        hex_index = entry["mcg"].hex_index
+        path = np.array([hex_index[hex_id] for hex_id in entry["corpus"][path_id]], dtype=np.int32)
+        return map_id, path[:position], int(path[position]), int(path[-1])
+
+
+def collate_map_batch(batch):
+    """``(map_id, context, lengths, masked, target)`` for a batch drawn from a single map"""
+    map_ids = {map_id for map_id, _, _, _ in batch}
+    if len(map_ids) != 1:
+        raise ValueError(f"Batch mixes maps {sorted(map_ids)}; use MapGroupedBatchSampler")
+    return (map_ids.pop(), *collate_paths([sample[1:] for sample in batch]))
+
+
+class MapGroupedBatchSampler(Sampler):
+    """Batches that each come from one map, ordered so few maps are live at once.
+
+    Maps are shuffled and taken ``maps_per_window`` at a time (keep it at or
+    below the dataset's ``cache_size``); the batches of a window are shuffled
+    together, so every map is loaded about once per epoch.
+    """
+
+    def __init__(self, dataset, batch_size, maps_per_window=None, shuffle=True, seed=None):
+        self.sample_offsets = dataset.map_sample_offsets
+        self.batch_size = batch_size
+        self.maps_per_window = maps_per_window or dataset.cache_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+
+    def __iter__(self):
+        num_maps = len(self.sample_offsets) - 1
+        maps = self.rng.permutation(num_maps) if self.shuffle else np.arange(num_maps)
+        for start in range(0, num_maps, self.maps_per_window):
+            batches = []
+            for map_id in maps[start:start + self.maps_per_window]:
+                first, end = self.sample_offsets[map_id], self.sample_offsets[map_id + 1]
+                indices = np.arange(first, end)
+                if self.shuffle:
+                    indices = self.rng.permutation(indices)
+                batches.extend(indices[i:i + self.batch_size].tolist() for i in range(0, len(indices), self.batch_size))
+            if self.shuffle:
+                batches = [batches[i] for i in self.rng.permutation(len(batches))]
+            yield from batches
+
+    def __len__(self):
+        counts = np.diff(self.sample_offsets)
+        return int(((counts + self.batch_size - 1) // self.batch_size).sum())
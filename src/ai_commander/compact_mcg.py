@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+MAGIC = b"WBMCG001"
+ALIGNMENT = 64
+
+
+class UnitGraph(Mapping):
+    """CSR arrays of one unit type, readable like ``mcg[unit_type]``"""
+
+    def __init__(self, hex_ids, hex_index, offsets, neighbors, costs):
+        self.hex_ids = hex_ids
+        self.hex_index = hex_index
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.costs = costs
+
+    def row(self, idx):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.neighbors[start:end], self.costs[start:end]
+
+    def __getitem__(self, hex_id):
+        idx = self.hex_index[hex_id]
+        if self.offsets[idx] == self.offsets[idx + 1]:
+            raise KeyError(hex_id)
+        return NeighborView(self, idx)
+
+    def __iter__(self):
+        degrees = np.diff(self.offsets)
+        for idx in np.flatnonzero(degrees):
+            yield self.hex_ids[idx]
+
+    def __len__(self):
+        return int(np.count_nonzero(np.diff(self.offsets)))
+
+    def __contains__(self, hex_id):
+        idx = self.hex_index.get(hex_id)
+        return idx is not None and self.offsets[idx] != self.offsets[idx + 1]
+
+    def to_dict(self):
+        graph = {}
+        neighbors = self.neighbors.tolist()
+        costs = self.costs.tolist()
+        offsets = self.offsets.tolist()
+        for idx, hex_id in enumerate(self.hex_ids):
+            start, end = offsets[idx], offsets[idx + 1]
+            if start == end:
+                continue
+            graph[hex_id] = {
+                self.hex_ids[n]: c for n, c in zip(neighbors[start:end], costs[start:end])
+            }
+        return graph
+
+
+class NeighborView(Mapping):
+    """Neighbors of a single hex, readable like ``mcg[unit_type][hex_id]``"""
+
+    def __init__(self, unit_graph, idx):
+        self.unit_graph = unit_graph
+        self.idx = idx
+
+    def _row(self):
+        neighbors, costs = self.unit_graph.row(self.idx)
+        return [self.unit_graph.hex_ids[n] for n in neighbors.tolist()], costs.tolist()
+
+    def __getitem__(self, hex_id):
+        neighbor_ids, costs = self._row()
+        try:
+            return costs[neighbor_ids.index(hex_id)]
+        except ValueError:
+            raise KeyError(hex_id) from None
+
+    def __iter__(self):
+        return iter(self._row()[0])
+
+    def __len__(self):
+        return int(self.unit_graph.offsets[self.idx + 1] - self.unit_graph.offsets[self.idx])
+
+    def items(self):
+        return list(zip(*self._row()))
+
+
+class CompactMCG(Mapping):
+    """Array-backed movement cost graph.
+
+    Hexes are addressed by integer index (position in ``hex_ids``). Every unit
+    type keeps its edges in CSR form: ``offsets`` (int64, N + 1), ``neighbors``
+    (int32) and ``costs`` (float32). Indexing the object with a unit type gives
+    a read-only view that behaves like the nested dict from ``build_graph``.
+    """
+
+    def __init__(self, hex_ids, units):
+        self.hex_ids = list(hex_ids)
+        self.hex_index = {hex_id: i for i, hex_id in enumerate(self.hex_ids)}
+        self.units = {}
+        for unit_type, (offsets, neighbors, costs) in units.items():
+            self.units[unit_type] = UnitGraph(self.hex_ids, self.hex_index, offsets, neighbors, costs)
+
+    @property
+    def num_hexes(self):
+        return len(self.hex_ids)
+
+    def unit(self, unit_type):
+        return self.units[unit_type]
+
+    def __getitem__(self, unit_type):
+        return self.units[unit_type]
+
+    def __iter__(self):
+        return iter(self.units)
+
+    def __len__(self):
+        return len(self.units)
+
+    def to_dict(self):
+        return {unit_type: graph.to_dict() for unit_type, graph in self.units.items()}
+
+    def content_hash(self):
+        """SHA-256 of hex ids and all edge arrays; changes whenever the graph does"""
+        digest = hashlib.sha256()
+        digest.update("\n".join(self.hex_ids).encode("utf-8"))
+        for unit_type in sorted(self.units):
+            graph = self.units[unit_type]
+            digest.update(unit_type.encode("utf-8"))
+            for array, dtype in ((graph.offsets, np.int64), (graph.neighbors, np.int32), (graph.costs, np.float32)):
+                digest.update(np.ascontiguousarray(array, dtype=dtype).tobytes())
+        return digest.hexdigest()
+
+    def replace_rows(self, unit_type, rows):
+        """Replace the outgoing edges of some hexes: ``rows = {hex_id: {neighbor_id: cost}}``.
+
+        The arrays are rebuilt in memory, so a memory-mapped graph is never written to.
+        """
+        graph = self.units[unit_type]
+        replaced = np.array([self.hex_index[hex_id] for hex_id in rows], dtype=np.int64)
+        degrees = np.diff(graph.offsets)
+        sources = np.repeat(np.arange(self.num_hexes, dtype=np.int64), degrees)
+        keep = ~np.isin(sources, replaced)
+
+        new_sources = np.array(
+            [self.hex_index[hex_id] for hex_id, row in rows.items() for _ in row], dtype=np.int64
+        )
+        new_neighbors = np.array(
+            [self.hex_index[n] for row in rows.values() for n in row], dtype=np.int32
+        )
+        new_costs = np.array([c for row in rows.values() for c in row.values()], dtype=np.float32)
+
+        sources = np.concatenate([sources[keep], new_sources])
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(self.num_hexes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.num_hexes), out=offsets[1:])
+
+        graph.offsets = offsets
+        graph.neighbors = np.concatenate([graph.neighbors[keep], new_neighbors])[order]
+        graph.costs = np.concatenate([graph.costs[keep], new_costs])[order]
+
+    @classmethod
+    def from_graph(cls, graph, hex_ids=None):
+        """Build from the nested dict produced by ``MovementCostGraphBuilder.build_graph``"""
+        if hex_ids is None:
+            hex_ids = sorted(graph_hex_ids(graph))
+        hex_index = {hex_id: i for i, hex_id in enumerate(hex_ids)}
+
+        units = {}
+        for unit_type, unit_graph in graph.items():
+            degrees = np.zeros(len(hex_ids), dtype=np.int64)
+            neighbors, costs = [], []
+            for hex_id in hex_ids:
+                row = unit_graph.get(hex_id)
+                if not row:
+                    continue
+                degrees[hex_index[hex_id]] = len(row)
+                neighbors.extend(hex_index[n] for n in row)
+                costs.extend(row.values())
+            offsets = np.zeros(len(hex_ids) + 1, dtype=np.int64)
+            np.cumsum(degrees, out=offsets[1:])
+            units[unit_type] = (
+                offsets,
+                np.asarray(neighbors, dtype=np.int32),
+                np.asarray(costs, dtype=np.float32),
+            )
+        return cls(hex_ids, units)
+
+    @classmethod
+    def from_json(cls, graph_path):
+        with open(graph_path) as f:
+            return cls.from_graph(json.load(f))
+
+    def save(self, path):
+        """Write a single binary file whose arrays can be memory-mapped by ``load``"""
+        arrays = {"hex_ids": np.asarray(self.hex_ids, dtype="S")}
+        for unit_type, graph in self.units.items():
+            arrays[f"{unit_type}/offsets"] = np.ascontiguousarray(graph.offsets, dtype=np.int64)
+            arrays[f"{unit_type}/neighbors"] = np.ascontiguousarray(graph.neighbors, dtype=np.int32)
+            arrays[f"{unit_type}/costs"] = np.ascontiguousarray(graph.costs, dtype=np.float32)
+
+        entries = {}
+        position = 0
+        for name, array in arrays.items():
+            position = _align(position)
+            entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+            position += array.nbytes
+
+        header = json.dumps({"units": list(self.units), "arrays": entries}).encode("utf-8")
+        data_start = _align(len(MAGIC) + 8 + len(header))
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + entries[name]["offset"])
+                f.write(array.tobytes())
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Read a file written by ``save``.
+
+        With ``mmap=True`` the arrays are read-only views over a shared memory
+        map, so worker processes attaching the same file do not copy the graph.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a compact MCG file")
+            header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_len))
+        data_start = _align(len(MAGIC) + 8 + header_len)
+
+        if mmap:
+            buffer = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            buffer = np.fromfile(path, dtype=np.uint8)
+
+        def array(name):
+            entry = header["arrays"][name]
+            dtype = np.dtype(entry["dtype"])
+            count = int(np.prod(entry["shape"], dtype=np.int64))
+            start = data_start + entry["offset"]
+            return buffer[start:start + count * dtype.itemsize].view(dtype).reshape(entry["shape"])
+
+        hex_ids = [h.decode("utf-8") for h in array("hex_ids").tolist()]
+        units = {
+            unit_type: (
+                array(f"{unit_type}/offsets"),
+                array(f"{unit_type}/neighbors"),
+                array(f"{unit_type}/costs"),
+            )
+            for unit_type in header["units"]
+        }
+        return cls(hex_ids, units)
+
+
+def as_compact(mcg, hex_ids=None):
+    return mcg if isinstance(mcg, CompactMCG) else CompactMCG.from_graph(mcg, hex_ids)
+
+
+def edge_lists(graph):
+    """``(offsets, neighbors, costs)`` of a ``UnitGraph`` as Python lists, for search loops"""
+    # Listy Pythona są szybsze niż indeksowanie numpy w pętli wyszukiwania
+    return graph.offsets.tolist(), graph.neighbors.tolist(), graph.costs.tolist()
+
+
+def graph_hex_ids(graph):
+    """Every hex with an edge, from or to it, in a dict graph"""
+    hex_ids = set()
+    for unit_graph in graph.values():
+        for hex_id, neighbors in unit_graph.items():
+            hex_ids.add(hex_id)
+            hex_ids.update(neighbors)
+    return hex_ids
+
+
+def reload_compact(mcg, hex_ids, overlay=None):
+    """Compact view of ``mcg`` after ``MovementCostGraphBuilder.apply_changes``, for ``invalidate_edges``.
+
+    The hex numbering ``hex_ids`` is kept, so per-hex caches stay valid.
+    Only a dict graph that gained a hex needs new numbers: the new hexes
+    are merged into the sorted ids and an attached ``overlay`` is moved to
+    them. Returns ``(compact, renumbered)``; when ``renumbered`` is true the
+    caller must rebuild everything indexed by hex.
+    """
+    try:
+        return as_compact(mcg, hex_ids), False
+    except KeyError:
+        pass
+    # Heks bez krawędzi dostał pierwszą krawędź w grafie-słowniku
+    compact = CompactMCG.from_graph(mcg, sorted(set(hex_ids) | graph_hex_ids(mcg)))
+    if overlay is not None:
+        overlay.renumber(compact)
+    return compact, True
+
+
+def load_mcg(graph_path):
+    """Load an MCG saved either as ``mcg.json`` or as a compact ``.bin`` file"""
+    if os.path.splitext(graph_path)[1] == ".bin":
+        return CompactMCG.load(graph_path)
+    with open(graph_path) as f:
+        return json.load(f)
+
+
+def _align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,121 @@
+import numpy as np
+
+from ai_commander.compact_mcg import as_compact, reload_compact
+
+
+def union(parent, sources, targets):
+    """Merge the components joined by edges ``sources[i] - targets[i]``.
+
+    Union-find done as array operations: every edge hooks the larger root
+    under the smaller one, then pointer jumping compresses the paths.
+    ``parent`` must already be compressed (every entry is a root); the
+    result is too, with the smallest hex index of each component as root.
+    """
+    while True:
+        roots_a, roots_b = parent[sources], parent[targets]
+        low, high = np.minimum(roots_a, roots_b), np.maximum(roots_a, roots_b)
+        hooked = parent.copy()
+        np.minimum.at(hooked, high, low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, parent):
+            return parent
+        parent = hooked
+
+
+def edge_arrays(graph, num_hexes):
+    sources = np.repeat(np.arange(num_hexes, dtype=np.int64), np.diff(graph.offsets))
+    return sources, np.asarray(graph.neighbors, dtype=np.int64)
+
+
+def component_labels(graph, num_hexes):
+    """Label connected components of one unit type's CSR graph.
+
+    MCG edges are symmetric (roads and river blocks apply both ways), so these
+    are also the strongly connected components. Labels are the smallest hex
+    index of each component.
+    """
+    return union(np.arange(num_hexes, dtype=np.int64), *edge_arrays(graph, num_hexes))
+
+
+class ComponentIndex:
+    """Connected components of every unit type, for O(1) reachability checks.
+
+    ``labels[unit][i]`` is the component of hex index ``i``; two hexes are
+    connected exactly when their labels match. Pass the index in ``caches``
+    of ``MovementCostGraphBuilder.apply_changes`` to keep it current.
+    """
+
+    def __init__(self, mcg, unit_types=None):
+        self.mcg = mcg
+        self.compact = as_compact(mcg)
+        self.hex_ids = self.compact.hex_ids
+        self.hex_index = self.compact.hex_index
+        self.labels = {
+            unit_type: component_labels(self.compact.unit(unit_type), self.compact.num_hexes)
+            for unit_type in unit_types or list(self.compact)
+        }
+
+    def component(self, unit_type, hex_id):
+        idx = self.hex_index.get(hex_id)
+        return None if idx is None else int(self.labels[unit_type][idx])
+
+    def connected(self, unit_type, start, goal):
+        """True when ``goal`` can be reached from ``start`` at all, ignoring budgets"""
+        label = self.component(unit_type, start)
+        return label is not None and label == self.component(unit_type, goal)
+
+    def connected_indices(self, unit_type, start_idx, goal_idx):
+        labels = self.labels[unit_type]
+        return labels[start_idx] == labels[goal_idx]
+
+    def size(self, unit_type, hex_id):
+        labels = self.labels[unit_type]
+        return int(np.count_nonzero(labels == labels[self.hex_index[hex_id]]))
+
+    def num_components(self, unit_type):
+        labels = self.labels[unit_type]
+        return int(np.count_nonzero(labels == np.arange(len(labels))))
+
+    def invalidate_edges(self, changed):
+        """Patch the labels after ``MovementCostGraphBuilder.apply_changes``.
+
+        New edges merge their two components. A removed edge may split its
+        component, so only the hexes of that component are relabelled from
+        the edges left inside it.
+        """
+        self.compact, renumbered = reload_compact(self.mcg, self.hex_ids)
+        if renumbered:
+            self.hex_ids = self.compact.hex_ids
+            self.hex_index = self.compact.hex_index
+            self.labels = {
+                unit_type: component_labels(self.compact.unit(unit_type), self.compact.num_hexes)
+                for unit_type in self.labels
+            }
+            return
+
+        by_unit = {}
+        for unit_type, from_hex, to_hex in changed:
+            by_unit.setdefault(unit_type, []).append((self.hex_index[from_hex], self.hex_index[to_hex]))
+
+        for unit_type, edges in by_unit.items():
+            if unit_type not in self.labels:
+                continue
+            graph = self.compact.unit(unit_type)
+            labels = self.labels[unit_type].copy()
+            added = [(u, v) for u, v in edges if v in graph.row(u)[0]]
+            removed = [(u, v) for u, v in edges if v not in graph.row(u)[0]]
+
+            if removed:
+                affected = np.isin(labels, [labels[u] for u, _ in removed])
+                labels[affected] = np.flatnonzero(affected)
+                sources, targets = edge_arrays(graph, self.compact.num_hexes)
+                inside = affected[sources]
+                labels = union(labels, sources[inside], targets[inside])
+            if added:
+                sources, targets = np.array(added, dtype=np.int64).T
+                labels = union(labels, sources, targets)
+            self.labels[unit_type] = labels
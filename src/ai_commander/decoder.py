@@ -0,0 +1,121 @@
+import math
+
+import torch
+
+from ai_commander.reachability import MP_EPSILON
+
+
+class BeamSearchDecoder:
+    """Model-driven routes for many units at once.
+
+    Every query ``(path, goal, unit_type, mp)`` keeps ``beam_width``
+    partial routes. Each depth scores the candidates of all beams of all
+    queries in one ``rollout_step`` and keeps the best ``beam_width``
+    continuations per query by summed log-probability. A route never
+    re-enters a hex it (or its starting path) has visited, and never
+    spends more than ``mp`` movement points, if given. A query finishes
+    once its best route at the goal outscores every unfinished beam.
+    """
+
+    def __init__(self, model, mcg, unit_types=None, beam_width=4, max_steps=50):
+        self.model = model.eval()
+        self.beam_width = beam_width
+        self.max_steps = max_steps
+        self.tables = {}
+        for unit_type in unit_types or list(mcg):
+            neighbors, neighbor_mask = model.neighbor_table(mcg, unit_type)
+            costs = torch.full(neighbors.shape, math.inf)
+            for hex_id, row in mcg[unit_type].items():
+                costs[model.hex_to_int(hex_id), :len(row)] = torch.tensor(list(row.values()), dtype=torch.float32)
+            self.tables[unit_type] = (neighbors, neighbor_mask, costs)
+        self.row_hexes = {model.hex_to_int(h): h for unit_type in self.tables for h in mcg[unit_type]}
+
+    def decode(self, requests):
+        """``(route, log_prob, mp_spent)`` per ``(path, goal, unit_type[, mp])`` request, ``None`` if the goal
+        was not reached; ``route`` are the hex ids after ``path``"""
+        results = [None] * len(requests)
+        groups = {}
+        for i, request in enumerate(requests):
+            groups.setdefault(request[2], []).append(i)
+        for unit_type, members in groups.items():
+            paths = [[self.model.hex_to_int(h) for h in requests[i][0]] for i in members]
+            goals = [self.model.hex_to_int(requests[i][1]) for i in members]
+            budgets = [requests[i][3] if len(requests[i]) > 3 and requests[i][3] is not None else math.inf
+                       for i in members]
+            for i, found in zip(members, self.decode_rows(paths, goals, budgets, *self.tables[unit_type])):
+                if found is not None:
+                    rows, score, spent = found
+                    results[i] = ([self.row_hexes[row] for row in rows], score, spent)
+        return results
+
+    @torch.no_grad()
+    def decode_rows(self, paths, goals, budgets, neighbors, neighbor_mask, costs):
+        """``decode`` in embedding rows for queries of one unit type"""
+        B, W = len(paths), self.beam_width
+        lengths = torch.tensor([len(path) for path in paths], dtype=torch.long)
+        context = torch.zeros((B, int(lengths.max())), dtype=torch.long)
+        history = torch.full((B, int(lengths.max())), -1, dtype=torch.long)
+        for b, path in enumerate(paths):
+            context[b, :len(path)] = torch.tensor(path, dtype=torch.long)
+            history[b, :len(path)] = context[b, :len(path)]
+        target = torch.tensor(goals, dtype=torch.long)
+
+        # Płasko: beam w zapytania b to wiersz b * W + w
+        beams = torch.arange(B).repeat_interleave(W)
+        state = self.model.start_rollout(context, lengths, target).select(beams)
+        history, target = history[beams], target[beams]
+        budget = torch.tensor(budgets, dtype=torch.float64)[beams]
+        spent = torch.zeros(B * W, dtype=torch.float64)
+        score = torch.full((B, W), -math.inf, dtype=torch.float64)
+        score[:, 0] = 0.0
+        score = score.flatten()
+        done = state.current == target
+
+        for _ in range(self.max_steps):
+            live = ~done & (score > -math.inf)
+            if not live.any():
+                break
+            candidates, probs = self.model.rollout_step(state, neighbors, neighbor_mask)
+            step_costs = costs[state.current].double()
+            allowed = neighbor_mask[state.current] & (spent[:, None] + step_costs <= budget[:, None] + MP_EPSILON)
+            allowed &= ~(candidates[:, :, None] == history[:, None, :]).any(dim=2)
+            expanded = score[:, None] + torch.log(probs.double()).masked_fill(~allowed, -math.inf)
+            expanded[~live] = -math.inf
+            # Skończony beam przechodzi dalej bez zmian przez slot 0
+            expanded[done, 0] = score[done]
+
+            K = candidates.shape[1]
+            top_score, top = expanded.view(B, W * K).topk(min(W, W * K), dim=1)
+            if top.shape[1] < W:
+                top = torch.cat([top, top[:, :1].expand(B, W - top.shape[1])], dim=1)
+                top_score = torch.cat([top_score, torch.full((B, W - top_score.shape[1]), -math.inf, dtype=torch.float64)], dim=1)
+            parent = (torch.arange(B)[:, None] * W + top // K).flatten()
+            slot = (top % K).flatten()
+
+            was_done = done[parent]
+            next_rows = torch.where(was_done, state.current[parent], candidates[parent, slot])
+            spent = spent[parent] + torch.where(was_done, torch.zeros(()), step_costs[parent, slot]).double()
+            history = torch.cat([history[parent], torch.where(was_done, -1, next_rows)[:, None]], dim=1)
+            state = self.model.advance(state.select(parent), next_rows)
+            score = top_score.flatten()
+            done = was_done | (next_rows == target)
+
+            # Zapytanie jest gotowe, gdy najlepsza trasa do celu bije każdy otwarty beam
+            best_done = score.masked_fill(~done, -math.inf).view(B, W).max(dim=1).values
+            best_open = score.masked_fill(done, -math.inf).view(B, W).max(dim=1).values
+            finished = (best_done > -math.inf) & (best_done >= best_open)
+            score = score.masked_fill(finished.repeat_interleave(W) & ~done, -math.inf)
+
+        results = []
+        for b in range(B):
+            rows = slice(b * W, (b + 1) * W)
+            ranked = score[rows].masked_fill(~done[rows], -math.inf)
+            w = int(ranked.argmax())
+            if ranked[w] == -math.inf:
+                results.append(None)
+                continue
+            route = history[b * W + w, len(paths[b]):]
+            # Po kolumnach historii innych zapytań zostają -1
+            route = route[route >= 0].tolist()
+            results.append((route, float(ranked[w]), float(spent[b * W + w])))
+        return results
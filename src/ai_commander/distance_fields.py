@@ -0,0 +1,248 @@
+import json
+import os
+
+import numpy as np
+
+from ai_commander.compact_mcg import as_compact, load_mcg, reload_compact
+
+MANIFEST_NAME = "distance_fields.json"
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def padded_edges(graph, num_hexes):
+    """CSR edges as ``[N, K]`` neighbor/cost matrices; padding points at the hex itself with infinite cost"""
+    degrees = np.diff(graph.offsets)
+    max_degree = max(int(degrees.max(initial=0)), 1)
+    neighbors = np.repeat(np.arange(num_hexes, dtype=np.int64)[:, None], max_degree, axis=1)
+    costs = np.full((num_hexes, max_degree), np.inf, dtype=np.float32)
+    rows = np.repeat(np.arange(num_hexes), degrees)
+    slots = np.arange(len(graph.neighbors)) - graph.offsets[rows]
+    neighbors[rows, slots] = graph.neighbors
+    costs[rows, slots] = graph.costs
+    return neighbors, costs
+
+
+def relax(dist, next_hop, neighbors, costs, active):
+    """Min-plus Bellman-Ford sweeps over rows until no distance improves; used to patch fields.
+
+    ``dist[s, t] = min_k costs[s, k] + dist[neighbors[s, k], t]``; only rows
+    marked in ``active`` (or whose neighbors improved) are recomputed.
+    """
+    num_hexes, max_degree = neighbors.shape
+    block = max(1, BLOCK_BYTES // (4 * max_degree * max(num_hexes, 1)))
+    passable = np.isfinite(costs)
+    while active.any():
+        changed = np.zeros(num_hexes, dtype=bool)
+        rows = np.flatnonzero(active)
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            candidates = costs[chunk][:, :, None] + dist[neighbors[chunk]]
+            best_slot = candidates.argmin(axis=1)
+            best = np.take_along_axis(candidates, best_slot[:, None, :], axis=1)[:, 0]
+            improved = best < dist[chunk]
+            if not improved.any():
+                continue
+            hops = np.take_along_axis(neighbors[chunk], best_slot, axis=1)
+            dist[chunk] = np.where(improved, best, dist[chunk])
+            next_hop[chunk] = np.where(improved, hops, next_hop[chunk])
+            changed[chunk[improved.any(axis=1)]] = True
+        active = (changed[neighbors] & passable).any(axis=1)
+
+
+def all_pairs(graph, num_hexes):
+    """Multi-source Dijkstra for every source at once, as array operations.
+
+    Entries ``(s, t)`` are settled in cost buckets as wide as the cheapest
+    edge (delta-stepping): an entry in the lowest bucket can no longer
+    improve, so it is expanded exactly once, over the in-edges of ``s``.
+    With a zero-cost edge the bucket shrinks to the entries at the current
+    minimum.
+    """
+    dist = np.full(num_hexes * num_hexes, np.inf, dtype=np.float32)
+    next_hop = np.full(num_hexes * num_hexes, -1, dtype=np.int32)
+    diagonal = np.arange(num_hexes, dtype=np.int64) * (num_hexes + 1)
+    dist[diagonal] = 0
+    next_hop[diagonal] = np.arange(num_hexes)
+    if len(graph.costs) == 0:
+        return dist.reshape(num_hexes, num_hexes), next_hop.reshape(num_hexes, num_hexes)
+
+    # Krawędzie wchodzące w CSR: kto może wejść do heksu i za ile
+    sources = np.repeat(np.arange(num_hexes, dtype=np.int64), np.diff(graph.offsets))
+    targets = np.asarray(graph.neighbors, dtype=np.int64)
+    order = np.argsort(targets, kind="stable")
+    in_sources = sources[order]
+    in_costs = np.asarray(graph.costs, dtype=np.float32)[order]
+    in_offsets = np.zeros(num_hexes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(targets, minlength=num_hexes), out=in_offsets[1:])
+    delta = float(in_costs.min())
+
+    pending_keys = diagonal
+    pending_dist = np.zeros(num_hexes, dtype=np.float32)
+    while len(pending_keys):
+        lowest = pending_dist.min()
+        # Kubełek o szerokości 0 byłby pusty i pętla kręciłaby się bez końca
+        settle = pending_dist < lowest + delta if delta > 0 else pending_dist <= lowest
+        keys, values = pending_keys[settle], pending_dist[settle]
+        pending_keys, pending_dist = pending_keys[~settle], pending_dist[~settle]
+        keys = np.unique(keys[dist[keys] == values])
+
+        via, goal = keys // num_hexes, keys % num_hexes
+        degrees = in_offsets[via + 1] - in_offsets[via]
+        entry = np.repeat(np.arange(len(keys)), degrees)
+        edge = np.arange(len(entry)) - np.repeat(np.cumsum(degrees) - degrees, degrees) + in_offsets[via][entry]
+
+        candidates = in_costs[edge] + dist[keys[entry]]
+        candidate_keys = in_sources[edge] * num_hexes + goal[entry]
+        hops = via[entry]
+        better = candidates < dist[candidate_keys]
+        candidates, candidate_keys, hops = candidates[better], candidate_keys[better], hops[better]
+
+        np.minimum.at(dist, candidate_keys, candidates)
+        won = dist[candidate_keys] == candidates
+        next_hop[candidate_keys[won]] = hops[won]
+        pending_keys = np.concatenate([pending_keys, candidate_keys[won]])
+        pending_dist = np.concatenate([pending_dist, candidates[won]])
+
+    return dist.reshape(num_hexes, num_hexes), next_hop.reshape(num_hexes, num_hexes)
+
+
+class DistanceFields:
+    """All-pairs movement costs and next hops per unit type.
+
+    ``distances[unit][s, t]`` is the cheapest cost from hex index ``s`` to
+    ``t`` (``inf`` when unreachable) and ``next_hops[unit][s, t]`` the first
+    hex on that route (``-1`` when unreachable). Stored as ``.npy`` files next
+    to the MCG and rebuilt only when the graph's content hash changes.
+    """
+
+    def __init__(self, mcg, distances, next_hops, content_hash=None):
+        self.mcg = mcg
+        self.compact = as_compact(mcg)
+        self.hex_ids = self.compact.hex_ids
+        self.hex_index = self.compact.hex_index
+        self.distances = distances
+        self.next_hops = next_hops
+        self.content_hash = content_hash or self.compact.content_hash()
+        self.edges = {
+            unit_type: padded_edges(self.compact.unit(unit_type), self.compact.num_hexes)
+            for unit_type in distances
+        }
+
+    @classmethod
+    def build(cls, mcg, unit_types=None):
+        compact = as_compact(mcg)
+        distances, next_hops = {}, {}
+        for unit_type in unit_types or list(compact):
+            distances[unit_type], next_hops[unit_type] = cls.compute(compact, unit_type)
+        return cls(mcg, distances, next_hops, compact.content_hash())
+
+    @staticmethod
+    def compute(compact, unit_type):
+        return all_pairs(compact.unit(unit_type), compact.num_hexes)
+
+    def save(self, directory):
+        for unit_type in self.distances:
+            np.save(os.path.join(directory, f"distances_{unit_type}.npy"), self.distances[unit_type])
+            np.save(os.path.join(directory, f"next_hops_{unit_type}.npy"), self.next_hops[unit_type])
+        with open(os.path.join(directory, MANIFEST_NAME), "w") as f:
+            json.dump({"content_hash": self.content_hash, "units": list(self.distances)}, f, indent=2)
+
+    @classmethod
+    def load(cls, mcg, directory, mmap=True):
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        mmap_mode = "r" if mmap else None
+        distances, next_hops = {}, {}
+        for unit_type in manifest["units"]:
+            distances[unit_type] = np.load(os.path.join(directory, f"distances_{unit_type}.npy"), mmap_mode=mmap_mode)
+            next_hops[unit_type] = np.load(os.path.join(directory, f"next_hops_{unit_type}.npy"), mmap_mode=mmap_mode)
+        return cls(mcg, distances, next_hops, manifest["content_hash"])
+
+    @classmethod
+    def load_or_build(cls, graph_path, unit_types=None):
+        """Distance fields for the MCG at ``graph_path``, cached next to it"""
+        mcg = load_mcg(graph_path)
+        directory = os.path.dirname(graph_path)
+        content_hash = as_compact(mcg).content_hash()
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            wanted = set(unit_types or mcg)
+            if manifest["content_hash"] == content_hash and wanted <= set(manifest["units"]):
+                print(f"✅ Distance fields already exist in ➡️  {directory}")
+                return cls.load(mcg, directory)
+
+        fields = cls.build(mcg, unit_types)
+        fields.save(directory)
+        print(f"✅ Distance fields saved to ➡️ {directory}")
+        return fields
+
+    def distance(self, unit_type, start, goal):
+        return float(self.distances[unit_type][self.hex_index[start], self.hex_index[goal]])
+
+    def next_hop(self, unit_type, start, goal):
+        hop = int(self.next_hops[unit_type][self.hex_index[start], self.hex_index[goal]])
+        return None if hop < 0 else self.hex_ids[hop]
+
+    def path(self, unit_type, start, goal):
+        """Cheapest path by following next hops; ``None`` when unreachable"""
+        next_hops = self.next_hops[unit_type]
+        node, goal_idx = self.hex_index[start], self.hex_index[goal]
+        path = [node]
+        while node != goal_idx:
+            node = int(next_hops[node, goal_idx])
+            if node < 0:
+                return None
+            path.append(node)
+        return [self.hex_ids[i] for i in path]
+
+    def invalidate_edges(self, changed):
+        """Patch the fields after ``MovementCostGraphBuilder.apply_changes``.
+
+        Cheaper or new edges only relax rows starting at them. For dearer or
+        removed edges every ``(s, t)`` entry whose route used the edge is reset
+        and recomputed from its still-valid neighbors.
+        """
+        self.compact, renumbered = reload_compact(self.mcg, self.hex_ids)
+        if renumbered:
+            self.hex_ids = self.compact.hex_ids
+            self.hex_index = self.compact.hex_index
+            for unit_type in self.distances:
+                self.distances[unit_type], self.next_hops[unit_type] = self.compute(self.compact, unit_type)
+                self.edges[unit_type] = padded_edges(self.compact.unit(unit_type), self.compact.num_hexes)
+            self.content_hash = self.compact.content_hash()
+            return
+
+        by_unit = {}
+        for unit_type, from_hex, to_hex in changed:
+            by_unit.setdefault(unit_type, []).append((self.hex_index[from_hex], self.hex_index[to_hex]))
+
+        for unit_type, edges in by_unit.items():
+            if unit_type not in self.distances:
+                continue
+            dist = np.array(self.distances[unit_type])
+            next_hop = np.array(self.next_hops[unit_type])
+            old_neighbors, old_costs = self.edges[unit_type]
+            neighbors, costs = padded_edges(self.compact.unit(unit_type), self.compact.num_hexes)
+            active = np.zeros(self.compact.num_hexes, dtype=bool)
+
+            for u, v in edges:
+                old_cost = old_costs[u][old_neighbors[u] == v].min(initial=np.inf)
+                new_cost = costs[u][neighbors[u] == v].min(initial=np.inf)
+                if new_cost < old_cost:
+                    active[u] = True
+                    continue
+                through = dist[:, u, None] + old_cost + dist[None, v, :]
+                stale = np.isfinite(dist) & (through <= dist * (1 + 1e-6) + 1e-6)
+                np.fill_diagonal(stale, False)
+                dist[stale] = np.inf
+                next_hop[stale] = -1
+                active |= stale.any(axis=1)
+
+            relax(dist, next_hop, neighbors, costs, active)
+            self.distances[unit_type] = dist
+            self.next_hops[unit_type] = next_hop
+            self.edges[unit_type] = (neighbors, costs)
+
+        self.content_hash = self.compact.content_hash()
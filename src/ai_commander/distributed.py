@@ -0,0 +1,91 @@
+import os
+import socket
+import time
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader
+
+from ai_commander.PlayerPathDataset import LengthBucketSampler, collate_paths
+
+
+class BatchLoss(nn.Module):
+    """``batch_loss`` as a module's forward, so ``DistributedDataParallel`` can wrap it"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, context, lengths, target, true_idx, neighbors, neighbor_mask):
+        return self.model.batch_loss(context, lengths, target, true_idx, neighbors, neighbor_mask)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _run_rank(rank, world_size, port, model, dataset, options):
+    """One training process: gloo group, sharded batches, all-reduced gradients"""
+    torch.set_num_threads(options["threads"])
+    dist.init_process_group("gloo", init_method=f"tcp://127.0.0.1:{port}", rank=rank, world_size=world_size)
+    try:
+        neighbors, neighbor_mask = model.neighbor_table(dataset.mcg, dataset.unit_type)
+        rows = model.dataset_rows(dataset)
+        # Ten sam seed na każdym ranku -> te same batche, każdy bierze swoją część
+        sampler = LengthBucketSampler(
+            dataset.context_lengths(), options["batch_size"], seed=options["seed"], rank=rank, world_size=world_size,
+        )
+        dataloader = DataLoader(
+            dataset, batch_sampler=sampler, collate_fn=collate_paths,
+            num_workers=options["num_workers"], persistent_workers=options["num_workers"] > 0,
+        )
+        loss_module = DistributedDataParallel(BatchLoss(model))
+        optimizers = model.optimizers(options["lr"])
+
+        for epoch in range(options["epochs"]):
+            start = time.perf_counter()
+            totals = torch.zeros(2, dtype=torch.float64)
+            for batch in dataloader:
+                # Każdy rank robi krok, nawet z pustym batchem, inaczej all-reduce się zawiesi
+                context, lengths, target, true_idx = model.prepare_batch(batch, rows, neighbors, neighbor_mask)
+                loss = loss_module(context, lengths, target, true_idx, neighbors, neighbor_mask)
+                loss.backward()
+                for optimizer in optimizers:
+                    optimizer.step()
+                    optimizer.zero_grad()
+                totals += torch.tensor([loss.item(), len(true_idx)], dtype=torch.float64)
+
+            dist.all_reduce(totals)
+            if rank == 0:
+                elapsed = time.perf_counter() - start
+                print(f"✅ Epoch {epoch+1} Loss: {totals[0]:.4f} ({totals[1] / elapsed:.0f} samples/s on {world_size} ranks)")
+
+        if rank == 0:
+            model.save_checkpoint(options["path"])
+        dist.barrier()
+    finally:
+        dist.destroy_process_group()
+
+
+def train_distributed(model, dataset, world_size, epochs=5, batch_size=64, lr=1e-3, path="models/mflmt.pt",
+                      num_workers=0, threads=None, seed=None):
+    """Train ``model`` in ``world_size`` CPU processes on this machine and load the result back.
+
+    Gradients are all-reduced with gloo after every step, so each step sees
+    ``world_size * batch_size`` samples. Every rank uses ``threads`` torch
+    threads (by default the cores split evenly) and ``num_workers``
+    data-loading processes; only rank 0 writes the checkpoint to ``path``.
+    """
+    options = {
+        "epochs": epochs, "batch_size": batch_size, "lr": lr, "path": path, "num_workers": num_workers,
+        "threads": threads or max(1, (os.cpu_count() or 1) // world_size),
+        "seed": seed if seed is not None else int(torch.randint(2 ** 31, ()).item()),
+    }
+    mp.spawn(_run_rank, args=(world_size, free_port(), model, dataset, options), nprocs=world_size)
+    model.load_state_dict(torch.load(path, map_location="cpu")["state_dict"])
+    return model
@@ -0,0 +1,276 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+
+class MoveSuggester:
+    """Batched ``suggest_next_move``: ranked next hexes for many ``(path, goal, unit_type)`` at once"""
+
+    def __init__(self, model, mcg, unit_types=None, top_k=None):
+        self.model = model.eval()
+        self.top_k = top_k
+        unit_types = unit_types or list(mcg)
+        self.tables = {unit_type: model.neighbor_table(mcg, unit_type) for unit_type in unit_types}
+        self.row_hexes = {model.hex_to_int(hex_id): hex_id for unit_type in unit_types for hex_id in mcg[unit_type]}
+
+    def encode(self, path, goal, unit_type):
+        """``(unit_type, context rows, goal row)``; raises on requests the model cannot score"""
+        if unit_type not in self.tables:
+            raise ValueError(f"Unknown unit type {unit_type!r}")
+        if not path:
+            raise ValueError("Path must contain at least the current hex")
+        return unit_type, [self.model.hex_to_int(hex_id) for hex_id in path], self.model.hex_to_int(goal)
+
+    @torch.inference_mode()
+    def suggest_batch(self, requests):
+        """Ranked ``[(hex_id, prob), ...]`` per encoded request, ``None`` where the unit cannot move"""
+        results = [None] * len(requests)
+        groups = {}
+        for i, (unit_type, _, _) in enumerate(requests):
+            groups.setdefault(unit_type, []).append(i)
+
+        for unit_type, members in groups.items():
+            neighbors, neighbor_mask = self.tables[unit_type]
+            lengths = torch.tensor([len(requests[i][1]) for i in members], dtype=torch.long)
+            context = torch.zeros((len(members), int(lengths.max())), dtype=torch.long)
+            for row, i in enumerate(members):
+                context[row, :lengths[row]] = torch.tensor(requests[i][1], dtype=torch.long)
+            target = torch.tensor([requests[i][2] for i in members], dtype=torch.long)
+
+            candidates, probs = self.model.forward_batch(context, lengths, target, neighbors, neighbor_mask)
+            mask = neighbor_mask[context.gather(1, (lengths - 1)[:, None]).squeeze(1)]
+            candidates, probs, mask = candidates.numpy(), probs.numpy(), mask.numpy()
+            for row, i in enumerate(members):
+                if not mask[row].any():
+                    continue
+                slots = np.flatnonzero(mask[row])
+                slots = slots[np.argsort(-probs[row, slots], kind="stable")][:self.top_k]
+                results[i] = [(self.row_hexes[int(candidates[row, k])], float(probs[row, k])) for k in slots]
+        return results
+
+
+class InferenceStats:
+    """Request latencies (last ``window`` requests) and batch sizes of a service"""
+
+    def __init__(self, window=100_000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+
+    def record_batch(self, submitted, finished):
+        self.batches += 1
+        self.requests += len(submitted)
+        self.latencies.extend(finished - t for t in submitted)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": self.requests / max(self.batches, 1),
+            "throughput": self.requests / elapsed if elapsed else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+        }
+
+
+class InferenceService:
+    """Asyncio micro-batching around a ``MoveSuggester``.
+
+    Requests queue up until ``max_batch_size`` are waiting or ``max_delay``
+    seconds have passed since the first one, then go through one batched
+    forward pass in a worker thread, so the event loop keeps accepting
+    requests meanwhile.
+    """
+
+    def __init__(self, suggester, max_batch_size=256, max_delay=0.002):
+        self.suggester = suggester
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.stats = InferenceStats()
+        self.queue = None
+        self.task = None
+        self.batch = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.stats = InferenceStats()
+        self.batch = []
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        """Stop batching; requests still queued or in flight fail with ``RuntimeError``"""
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        # Bez tego czekający na wynik wisieliby do końca pętli zdarzeń
+        waiting = [future for _, future, _ in self.batch]
+        while not self.queue.empty():
+            waiting.append(self.queue.get_nowait()[1])
+        self.batch = []
+        for future in waiting:
+            if not future.done():
+                future.set_exception(RuntimeError("Inference service stopped"))
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def suggest(self, path, goal, unit_type):
+        if self.task is None:
+            raise RuntimeError("Inference service is not running")
+        request = self.suggester.encode(path, goal, unit_type)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future, time.perf_counter()))
+        return await future
+
+    async def _next_batch(self):
+        # Zbierany batch jest widoczny dla stop(), także zanim trafi do modelu
+        batch = self.batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Wszystko, co już czeka w kolejce, i tak jedzie tym batchem
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            try:
+                results = await loop.run_in_executor(None, self.suggester.suggest_batch, [r for r, _, _ in batch])
+            except Exception as error:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                self.batch = []
+                continue
+            self.batch = []
+            self.stats.record_batch([submitted for _, _, submitted in batch], time.perf_counter())
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class LocalClient:
+    """In-process client of an ``InferenceService``"""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def suggest(self, path, goal, unit_type):
+        return await self.service.suggest(path, goal, unit_type)
+
+    async def suggest_many(self, requests):
+        """Submit ``(path, goal, unit_type)`` requests together, e.g. every unit of a corps"""
+        return await asyncio.gather(*(self.suggest(*request) for request in requests))
+
+
+async def serve_tcp(service, host="127.0.0.1", port=0):
+    """Newline-delimited JSON stand-in for a network front end.
+
+    Each line ``{"id", "path", "goal", "unit_type"}`` is answered with
+    ``{"id", "candidates"}`` or ``{"id", "error"}``; requests on one
+    connection are handled concurrently, so they batch together.
+    Returns the ``asyncio.Server``.
+    """
+
+    async def answer(line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if isinstance(request, dict):
+                request_id = request.get("id")
+            candidates = await service.suggest(request["path"], request["goal"], request["unit_type"])
+            response = {"id": request_id, "candidates": candidates}
+        except Exception as error:
+            # Także nieczytelna linia dostaje odpowiedź, inaczej klient czeka w nieskończoność
+            response = {"id": request_id, "error": f"{type(error).__name__}: {error}"}
+        writer.write(json.dumps(response).encode() + b"\n")
+
+    async def handle(reader, writer):
+        pending = set()
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(answer(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+class TcpClient:
+    """Client of ``serve_tcp``; concurrent ``suggest`` calls share one connection"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.ids = itertools.count()
+        self.pending = {}
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.listener = asyncio.create_task(self._listen())
+        return self
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.listener.cancel()
+
+    async def _listen(self):
+        try:
+            while line := await self.reader.readline():
+                response = json.loads(line)
+                future = self.pending.pop(response.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    future.set_exception(RuntimeError(response["error"]))
+                else:
+                    candidates = response["candidates"]
+                    future.set_result(None if candidates is None else [tuple(c) for c in candidates])
+        finally:
+            # Połączenie zamknięte albo zerwane: nikt już nie odpowie na oczekujące zapytania
+            pending, self.pending = self.pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the inference server closed"))
+
+    async def suggest(self, path, goal, unit_type):
+        if self.listener.done():
+            raise ConnectionError("Connection to the inference server closed")
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        request = {"id": request_id, "path": list(path), "goal": goal, "unit_type": unit_type}
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
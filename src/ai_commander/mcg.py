@@ -1,5 +1,31 @@
 import json
 import os
+import numpy as np
+from ai_commander.compact_mcg import CompactMCG
+
+# Kierunki sąsiadów (dc, dr) dla kolumn nieparzystych i parzystych
+ODD_COLUMN_DIRECTIONS = [(+1, 0), (+1, -1), (0, -1), (-1, -1), (-1, 0), (0, +1)]
+EVEN_COLUMN_DIRECTIONS = [(+1, +1), (+1, 0), (0, -1), (-1, 0), (-1, +1), (0, +1)]
+
+
+def offset_to_cube(col, row):
+    """Cube coordinates of an offset hex (works on ints and numpy arrays)"""
+    x = col - 1
+    z = row - (x - (x & 1)) // 2
+    return x, -x - z, z
+
+
+def hex_distance(col1, row1, col2, row2):
+    """Number of hex steps between two hexes, ignoring terrain"""
+    x1, y1, z1 = offset_to_cube(col1, row1)
+    x2, y2, z2 = offset_to_cube(col2, row2)
+    return np.maximum(np.maximum(abs(x1 - x2), abs(y1 - y2)), abs(z1 - z2))
+
+
+def hex_id_digits(width, height):
+    """Zero-padding of column and row in hex ids; maps up to 99x99 use classic CCRR ids"""
+    return max(2, len(str(max(width, height))))
+
 
 class MovementCostGraphBuilder:
     def __init__(self, map_data):
@@ -10,22 +36,21 @@ class MovementCostGraphBuilder:
         self.height = map_data["metadata"]["height"]
         self.roads = map_data.get("roads", {})
         self.rivers = map_data.get("rivers", {})
+        self.id_digits = hex_id_digits(self.width, self.height)
 
     @staticmethod
     def parse_hex_id(hex_id):
-        col = int(hex_id[:2])
-        row = int(hex_id[2:])
+        half = len(hex_id) // 2
+        col = int(hex_id[:half])
+        row = int(hex_id[half:])
         return col, row
 
     @staticmethod
-    def to_hex_id(col, row):
-        return f"{col:02d}{row:02d}"
+    def to_hex_id(col, row, digits=2):
+        return f"{col:0{digits}d}{row:0{digits}d}"
 
     def get_adjacent_hexes(self, col, row):
-        if col % 2 == 1:
-            directions = [(+1, 0), (+1, -1), (0, -1), (-1, -1), (-1, 0), (0, +1)]
-        else:
-            directions = [(+1, +1), (+1, 0), (0, -1), (-1, 0), (-1, +1), (0, +1)]
+        directions = ODD_COLUMN_DIRECTIONS if col % 2 == 1 else EVEN_COLUMN_DIRECTIONS
 
         neighbors = []
         for dc, dr in directions:
@@ -34,13 +59,13 @@ class MovementCostGraphBuilder:
                 neighbors.append((nc, nr))
         return neighbors
 
-    def build_graph(self):
-        unit_types = {
+    def unit_types(self):
+        return {
             unit for terrain in self.terrain_defs.values()
             for unit in terrain.get("move_cost", {}).keys()
         }
 
-        # Buduj mapę kosztów dróg
+    def build_road_costs(self, unit_types):
         road_costs = {unit: {} for unit in unit_types}
         for road in self.roads.values():
             road_type = road["type"]
@@ -53,41 +78,258 @@ class MovementCostGraphBuilder:
                         continue
                     road_costs[unit].setdefault(h1, {})[h2] = road_move_cost
                     road_costs[unit].setdefault(h2, {})[h1] = road_move_cost
+        return road_costs
 
-        # Krawędzie rzek
-        river_edges = {
+    def build_river_edges(self):
+        return {
             (h1, h2)
             for river in self.rivers.values()
             for segment in river.get("segments", [])
             for h1, h2 in [segment.split("-"), segment.split("-")[::-1]]
         }
 
+    def build_hex_rows(self, hex_id, unit_types, road_costs, river_edges):
+        """Outgoing edges of a single hex: ``{unit: {neighbor_id: cost}}``"""
+        rows = {unit: {} for unit in unit_types}
+        terrain = self.hex_terrain[hex_id]
+        col, row = self.parse_hex_id(hex_id)
+        for n_col, n_row in self.get_adjacent_hexes(col, row):
+            neighbor_id = self.to_hex_id(n_col, n_row, self.id_digits)
+            if neighbor_id not in self.hex_terrain:
+                continue
+
+            river_block = (hex_id, neighbor_id) in river_edges
+
+            for unit in unit_types:
+                has_road = hex_id in road_costs[unit] and neighbor_id in road_costs[unit][hex_id]
+                if river_block and not has_road:
+                    continue
+
+                if has_road:
+                    cost = road_costs[unit][hex_id][neighbor_id]
+                else:
+                    cost_from = self.terrain_defs[terrain].get("move_cost", {}).get(unit)
+                    cost_to = self.terrain_defs[self.hex_terrain[neighbor_id]].get("move_cost", {}).get(unit)
+                    if cost_to is None or cost_from is None:
+                        continue
+                    cost = cost_to
+
+                rows[unit][neighbor_id] = cost
+        return rows
+
+    def build_graph(self):
+        unit_types = self.unit_types()
+
+        # Buduj mapę kosztów dróg
+        road_costs = self.build_road_costs(unit_types)
+
+        # Krawędzie rzek
+        river_edges = self.build_river_edges()
+
         graph = {unit: {} for unit in unit_types}
 
-        for hex_id, terrain in self.hex_terrain.items():
+        for hex_id in self.hex_terrain:
+            for unit, row in self.build_hex_rows(hex_id, unit_types, road_costs, river_edges).items():
+                if row:
+                    graph[unit][hex_id] = row
+        return graph
+
+    def apply_changes(self, graph, hex_terrain=None, roads_added=None, roads_removed=None,
+                      rivers_added=None, rivers_removed=None, caches=()):
+        """Patch ``graph`` after a map edit without rebuilding it.
+
+        hex_terrain: ``{hex_id: terrain}`` for hexes whose terrain changed
+        roads_added / rivers_added: ``{id: road_or_river}`` in map JSON format
+        roads_removed / rivers_removed: ids of roads or rivers to remove
+
+        Only rows of hexes touching a changed hex, road segment or river
+        segment are recomputed. ``graph`` may be the dict from ``build_graph``
+        or a ``CompactMCG``. Every object in ``caches`` gets
+        ``invalidate_edges(changed)`` so it can drop exactly what changed.
+        Returns the set of changed edges as ``(unit, from_hex, to_hex)``.
+        """
+        affected = set()
+
+        for hex_id, terrain in (hex_terrain or {}).items():
+            if hex_id not in self.hex_terrain:
+                raise ValueError(f"Unknown hex {hex_id}")
+            if terrain not in self.terrain_defs:
+                raise ValueError(f"Unknown terrain {terrain}")
+            if self.hex_terrain[hex_id] == terrain:
+                continue
+            self.hex_terrain[hex_id] = terrain
             col, row = self.parse_hex_id(hex_id)
-            for n_col, n_row in self.get_adjacent_hexes(col, row):
-                neighbor_id = self.to_hex_id(n_col, n_row)
-                if neighbor_id not in self.hex_terrain:
+            affected.add(hex_id)
+            affected.update(self.to_hex_id(c, r, self.id_digits) for c, r in self.get_adjacent_hexes(col, row))
+
+        for road_id in roads_removed or ():
+            affected.update(self.roads.pop(road_id)["hexes"])
+        for road_id, road in (roads_added or {}).items():
+            if road_id in self.roads:
+                affected.update(self.roads[road_id]["hexes"])
+            self.roads[road_id] = road
+            affected.update(road["hexes"])
+
+        for river_id in rivers_removed or ():
+            for segment in self.rivers.pop(river_id).get("segments", []):
+                affected.update(segment.split("-"))
+        for river_id, river in (rivers_added or {}).items():
+            for segment in self.rivers.get(river_id, {}).get("segments", []) + river.get("segments", []):
+                affected.update(segment.split("-"))
+            self.rivers[river_id] = river
+
+        unit_types = self.unit_types()
+        road_costs = self.build_road_costs(unit_types)
+        river_edges = self.build_river_edges()
+
+        changed = set()
+        new_rows = {unit: {} for unit in unit_types}
+        for hex_id in affected:
+            if hex_id not in self.hex_terrain:
+                continue
+            for unit, row in self.build_hex_rows(hex_id, unit_types, road_costs, river_edges).items():
+                old_row = dict(graph.get(unit, {}).get(hex_id, {}).items())
+                if isinstance(graph, CompactMCG):
+                    row = {neighbor_id: float(np.float32(cost)) for neighbor_id, cost in row.items()}
+                if old_row == row:
                     continue
+                new_rows[unit][hex_id] = row
+                changed.update(
+                    (unit, hex_id, neighbor_id)
+                    for neighbor_id in old_row.keys() | row.keys()
+                    if old_row.get(neighbor_id) != row.get(neighbor_id)
+                )
 
-                river_block = (hex_id, neighbor_id) in river_edges
+        for unit, rows in new_rows.items():
+            if not rows:
+                continue
+            if isinstance(graph, CompactMCG):
+                graph.replace_rows(unit, rows)
+                continue
+            unit_graph = graph.setdefault(unit, {})
+            for hex_id, row in rows.items():
+                if row:
+                    unit_graph[hex_id] = row
+                else:
+                    unit_graph.pop(hex_id, None)
 
-                for unit in unit_types:
-                    has_road = hex_id in road_costs[unit] and neighbor_id in road_costs[unit][hex_id]
-                    if river_block and not has_road:
-                        continue
+        for cache in caches:
+            cache.invalidate_edges(changed)
+        return changed
+
+    def build_edge_arrays(self):
+        """Vectorized equivalent of ``build_graph``.
+
+        Returns ``hex_ids`` (map order) and, per unit type, edge arrays
+        ``(src, dst, cost_code)`` sorted by source hex and direction plus the
+        list of cost values the codes point into.
+        """
+        hex_ids = list(self.hex_terrain)
+        hex_index = {hex_id: i for i, hex_id in enumerate(hex_ids)}
+        num_hexes = len(hex_ids)
+        unit_types = self.unit_types()
+
+        coords = np.array([self.parse_hex_id(h) for h in hex_ids], dtype=np.int64).reshape(-1, 2)
+        cols, rows = coords[:, 0], coords[:, 1]
+
+        # Siatka (col, row) -> indeks heksu; tylko kanoniczne id mogą być sąsiadami
+        digits = self.id_digits
+        canonical = np.array([
+            i for i, (hex_id, col, row) in enumerate(zip(hex_ids, cols.tolist(), rows.tolist()))
+            if 1 <= col <= self.width and 1 <= row <= self.height
+            and hex_id == f"{col:0{digits}d}{row:0{digits}d}"
+        ], dtype=np.int64)
+        grid = np.full((self.width + 2, self.height + 2), -1, dtype=np.int64)
+        grid[cols[canonical], rows[canonical]] = canonical
+
+        directions = np.where(
+            (cols % 2 == 1)[:, None, None],
+            np.array(ODD_COLUMN_DIRECTIONS)[None],
+            np.array(EVEN_COLUMN_DIRECTIONS)[None],
+        )
+        n_cols = cols[:, None] + directions[..., 0]
+        n_rows = rows[:, None] + directions[..., 1]
+        inside = (n_cols >= 1) & (n_cols <= self.width) & (n_rows >= 1) & (n_rows <= self.height)
+        neighbors = np.where(
+            inside,
+            grid[np.clip(n_cols, 0, self.width + 1), np.clip(n_rows, 0, self.height + 1)],
+            -1,
+        ).ravel()
+        valid = neighbors >= 0
+        src = np.repeat(np.arange(num_hexes, dtype=np.int64), 6)[valid]
+        dst = neighbors[valid]
+        edge_keys = src * num_hexes + dst
+
+        # Krawędzie rzek
+        river_keys = [
+            hex_index[h1] * num_hexes + hex_index[h2]
+            for river in self.rivers.values()
+            for segment in river.get("segments", [])
+            for h1, h2 in [segment.split("-"), segment.split("-")[::-1]]
+            if h1 in hex_index and h2 in hex_index
+        ]
+        river_block = np.isin(edge_keys, np.array(river_keys, dtype=np.int64))
+
+        # Odcinki dróg w kolejności zapisu: (klucz krawędzi, typ drogi)
+        road_segments = []
+        for road in self.roads.values():
+            hexes = road["hexes"]
+            for h1, h2 in zip(hexes[:-1], hexes[1:]):
+                if h1 in hex_index and h2 in hex_index:
+                    i1, i2 = hex_index[h1], hex_index[h2]
+                    road_segments.append((i1 * num_hexes + i2, road["type"]))
+                    road_segments.append((i2 * num_hexes + i1, road["type"]))
+
+        terrain_names = list(self.terrain_defs)
+        terrain_index = {name: i for i, name in enumerate(terrain_names)}
+        hex_terrain = np.array([terrain_index[t] for t in self.hex_terrain.values()], dtype=np.int64)
 
-                    if has_road:
-                        cost = road_costs[unit][hex_id][neighbor_id]
-                    else:
-                        cost_from = self.terrain_defs[terrain].get("move_cost", {}).get(unit)
-                        cost_to = self.terrain_defs[self.hex_terrain[neighbor_id]].get("move_cost", {}).get(unit)
-                        if cost_to is None or cost_from is None:
-                            continue
-                        cost = cost_to
+        edges = {}
+        for unit in unit_types:
+            values = []
+            terrain_codes = np.full(len(terrain_names), -1, dtype=np.int64)
+            for i, name in enumerate(terrain_names):
+                cost = self.terrain_defs[name].get("move_cost", {}).get(unit)
+                if cost is not None:
+                    terrain_codes[i] = len(values)
+                    values.append(cost)
 
-                    graph[unit].setdefault(hex_id, {})[neighbor_id] = cost
+            road_keys, road_codes = [], []
+            for key, road_type in road_segments:
+                road_move_cost = self.terrain_defs.get(road_type, {}).get("move_cost", {}).get(unit)
+                if road_move_cost is None:
+                    continue
+                road_keys.append(key)
+                road_codes.append(len(values))
+                values.append(road_move_cost)
+
+            has_road = np.zeros(len(edge_keys), dtype=bool)
+            road_code = np.zeros(len(edge_keys), dtype=np.int64)
+            if road_keys:
+                # Późniejsza droga nadpisuje wcześniejszą, jak w build_graph
+                reversed_keys = np.array(road_keys[::-1], dtype=np.int64)
+                unique_keys, first = np.unique(reversed_keys, return_index=True)
+                unique_codes = np.array(road_codes[::-1], dtype=np.int64)[first]
+                pos = np.minimum(np.searchsorted(unique_keys, edge_keys), len(unique_keys) - 1)
+                has_road = unique_keys[pos] == edge_keys
+                road_code = unique_codes[pos]
+
+            cost_from = terrain_codes[hex_terrain[src]]
+            cost_to = terrain_codes[hex_terrain[dst]]
+            keep = has_road | (~river_block & (cost_from >= 0) & (cost_to >= 0))
+            codes = np.where(has_road, road_code, cost_to)[keep]
+            edges[unit] = (src[keep], dst[keep], codes, values)
+
+        return hex_ids, edges
+
+    def build_graph_vectorized(self):
+        """Same result as ``build_graph``, computed with array operations"""
+        hex_ids, edges = self.build_edge_arrays()
+        graph = {}
+        for unit, (src, dst, codes, values) in edges.items():
+            unit_graph = graph[unit] = {}
+            for a, b, code in zip(src.tolist(), dst.tolist(), codes.tolist()):
+                unit_graph.setdefault(hex_ids[a], {})[hex_ids[b]] = values[code]
         return graph
 
     def save_graph(self, output_base):
@@ -97,7 +339,23 @@ class MovementCostGraphBuilder:
             json.dump(graph, f, indent=2)
             print(f"✅ New MCG saved to ➡️ {output_file}")
             return graph    
-        
+
+    def build_compact(self):
+        hex_ids, edges = self.build_edge_arrays()
+        units = {}
+        for unit, (src, dst, codes, values) in edges.items():
+            offsets = np.zeros(len(hex_ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=len(hex_ids)), out=offsets[1:])
+            costs = np.asarray(values, dtype=np.float32)[codes] if values else np.zeros(0, dtype=np.float32)
+            units[unit] = (offsets, dst.astype(np.int32), costs)
+        return CompactMCG(hex_ids, units)
+
+    def save_compact(self, output_base):
+        compact = self.build_compact()
+        output_file = os.path.join(output_base, "mcg.bin")
+        compact.save(output_file)
+        print(f"✅ New compact MCG saved to ➡️ {output_file}")
+        return compact
 
     @classmethod
     def from_file(cls, map_file):
@@ -1,31 +1,70 @@
+import copy
+from typing import Dict, List
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torch.utils.data import DataLoader
-from torch.nn import CrossEntropyLoss
 from tqdm import tqdm
 import os
 
+from ai_commander.compact_mcg import as_compact
+from ai_commander.distributed import train_distributed
+from ai_commander.PlayerPathDataset import LengthBucketSampler, collate_paths
+
+class RolloutState:
+    """Running context of paths being extended hex by hex.
+
+    Keeps the sum of the path embeddings, the path lengths, the projected
+    goal and the current hex, so a step costs the same however long the
+    path already is. Tensors are ``[B, ...]``; ``select`` reorders or
+    repeats paths (e.g. to follow beams).
+    """
+
+    def __init__(self, path_sum, lengths, target_proj, current):
+        self.path_sum = path_sum
+        self.lengths = lengths
+        self.target_proj = target_proj
+        self.current = current
+
+    def select(self, indices):
+        return RolloutState(self.path_sum[indices], self.lengths[indices], self.target_proj[indices], self.current[indices])
+
+
 class ManueverabilityFirstLayerMapTensor(nn.Module):
-    def __init__(self, embedding_dim=32):
+    def __init__(self, embedding_dim=32, hex_ids=None, sparse=False):
+        """
+        hex_ids: hexes of the map, one embedding row each (see ``from_mcg``);
+                 without them rows are addressed by ``int(hex_id)``
+        sparse: sparse embedding gradients, trained with ``SparseAdam``
+        """
         super().__init__()
         self.embedding_dim = embedding_dim
-        self.hex_embed = nn.Embedding(10000, embedding_dim)  # max 10k hexes
+        self.sparse = sparse
+        self.hex_ids = list(hex_ids) if hex_ids is not None else None
+        if self.hex_ids is None:
+            self.hex_index = None
+            self.hex_embed = nn.Embedding(10000, embedding_dim, sparse=sparse)  # max 10k hexes
+        else:
+            self.hex_index = {hex_id: i for i, hex_id in enumerate(self.hex_ids)}
+            self.hex_embed = nn.Embedding(len(self.hex_ids), embedding_dim, sparse=sparse)
         self.linear_path = nn.Linear(embedding_dim, embedding_dim)
         self.linear_target = nn.Linear(embedding_dim, embedding_dim)
         self.output_layer = nn.Linear(embedding_dim, 1)
 
     def forward(self, path_ids, target_id, mcg, unit_type):
-        device = next(self.parameters()).device
-        hex_to_idx = lambda hex_id: int(hex_id)
+        parameter = next(self.parameters(), None)  # skwantowany model nie ma parametrów
+        device = parameter.device if parameter is not None else torch.device("cpu")
+        hex_to_idx = self.hex_to_int
 
         path_tensor = torch.tensor([hex_to_idx(h) for h in path_ids], dtype=torch.long, device=device)
-        path_embed = self.hex_embed(path_tensor).mean(dim=0)
+        path_embed = self.hex_embed(path_tensor).mean(dim=0, keepdim=True)
 
         target_tensor = torch.tensor([hex_to_idx(target_id)], dtype=torch.long, device=device)
-        target_embed = self.hex_embed(target_tensor).squeeze(0)
+        target_embed = self.hex_embed(target_tensor)
 
-        combined_context = self.linear_path(path_embed) + self.linear_target(target_embed)
+        # [1, D]: skwantowane warstwy Linear nie przyjmują wektorów 1D
+        combined_context = (self.linear_path(path_embed) + self.linear_target(target_embed)).squeeze(0)
 
         current_hex = path_ids[-1]
         neighbors = mcg.get(unit_type, {}).get(current_hex, {})
@@ -42,40 +81,245 @@ class ManueverabilityFirstLayerMapTensor(nn.Module):
 
         return candidate_ids, probs
 
-    def hex_to_int(self, hex_id): return int(hex_id)
+    @classmethod
+    def from_mcg(cls, mcg, embedding_dim=32, sparse=False):
+        """Model with one embedding row per hex of the MCG"""
+        return cls(embedding_dim, hex_ids=as_compact(mcg).hex_ids, sparse=sparse)
 
-    def train_mflmt(self, dataset, epochs=5, batch_size=1, lr=1e-3, model_dir="models", model_name="mflmt.pt"):
-        dataloader = DataLoader(dataset, shuffle=True, batch_size=batch_size)
-        optimizer = torch.optim.Adam(self.parameters(), lr=lr)
-        loss_fn = CrossEntropyLoss()
+    def hex_to_int(self, hex_id):
+        return int(hex_id) if self.hex_index is None else self.hex_index[hex_id]
 
-        for epoch in range(epochs):
-            total_loss = 0
-            for batch in tqdm(dataloader, desc=f"Epoch {epoch+1}"):
-                context_batch, target_hex_batch, goal_batch = batch
-                loss = 0
+    def save_checkpoint(self, path):
+        torch.save({
+            "state_dict": self.state_dict(),
+            "embedding_dim": self.embedding_dim,
+            "hex_ids": self.hex_ids,
+            "sparse": self.sparse,
+        }, path)
+
+    @classmethod
+    def load_checkpoint(cls, path, mcg=None):
+        """Load a model saved by ``save_checkpoint`` (or a bare ``state_dict``).
+
+        With ``mcg`` the stored hex mapping must match the map's hexes.
+        """
+        checkpoint = torch.load(path, map_location="cpu")
+        if "state_dict" not in checkpoint:
+            checkpoint = {"state_dict": checkpoint, "embedding_dim": checkpoint["hex_embed.weight"].shape[1]}
+        model = cls(checkpoint["embedding_dim"], checkpoint.get("hex_ids"), checkpoint.get("sparse", False))
+        if mcg is not None and model.hex_ids is not None and model.hex_ids != as_compact(mcg).hex_ids:
+            raise ValueError(f"Model {path} was trained on a different map")
+        model.load_state_dict(checkpoint["state_dict"])
+        return model
+
+    def optimizers(self, lr):
+        if not self.sparse:
+            return [torch.optim.Adam(self.parameters(), lr=lr)]
+        dense = [p for name, p in self.named_parameters() if not name.startswith("hex_embed.")]
+        return [torch.optim.SparseAdam(list(self.hex_embed.parameters()), lr=lr), torch.optim.Adam(dense, lr=lr)]
+
+    def forward_batch(self, context, lengths, target, neighbors, neighbor_mask):
+        """Score the neighbors of the last context hex for a whole batch at once.
+
+        context: ``[B, L]`` padded embedding indices of the paths so far
+        lengths: ``[B]`` real length of each path
+        target: ``[B]`` embedding index of each goal
+        neighbors, neighbor_mask: ``[N, K]`` table from ``neighbor_table``
+        Returns ``(candidates, probs)``, both ``[B, K]``; padded slots have
+        probability 0. Same numbers as ``forward`` on every sample.
+        """
+        return self.rollout_step(self.start_rollout(context, lengths, target), neighbors, neighbor_mask)
+
+    def start_rollout(self, context, lengths, target):
+        """``RolloutState`` of a batch of paths, to be extended one hex at a time with ``advance``"""
+        positions = torch.arange(context.shape[1], device=context.device)
+        valid = (positions[None, :] < lengths[:, None]).unsqueeze(-1)
+        return RolloutState(
+            path_sum=(self.hex_embed(context) * valid).sum(dim=1),
+            lengths=lengths.clone(),
+            target_proj=self.linear_target(self.hex_embed(target)),
+            current=context.gather(1, (lengths - 1)[:, None]).squeeze(1),
+        )
+
+    def rollout_step(self, state, neighbors, neighbor_mask):
+        """``(candidates, probs)`` of the next hex, as ``forward_batch`` on the full paths would give"""
+        combined_context = self.linear_path(state.path_sum / state.lengths[:, None]) + state.target_proj
+        candidates, mask = neighbors[state.current], neighbor_mask[state.current]
+        scores = self.output_layer(F.relu(self.hex_embed(candidates) + combined_context[:, None, :])).squeeze(-1)
+        probs = F.softmax(scores.masked_fill(~mask, float("-inf")), dim=1)
+        return candidates, probs.nan_to_num(0.0)
+
+    def advance(self, state, next_rows):
+        """State with ``next_rows`` appended to every path: one embedding lookup per path"""
+        return RolloutState(
+            path_sum=state.path_sum + self.hex_embed(next_rows),
+            lengths=state.lengths + 1,
+            target_proj=state.target_proj,
+            current=next_rows,
+        )
+
+    @torch.no_grad()
+    def rollout_batch(self, context, lengths, target, neighbors, neighbor_mask, max_steps=50):
+        """Greedy trajectories in embedding rows, one list per path, each ending at the goal,
+        a hex without candidates or after ``max_steps`` steps"""
+        state = self.start_rollout(context, lengths, target)
+        done = state.current == target
+        trajectories = [[] for _ in range(len(target))]
+        for _ in range(max_steps):
+            candidates, probs = self.rollout_step(state, neighbors, neighbor_mask)
+            done = done | (probs.sum(dim=1) == 0)
+            if done.all():
+                break
+            next_rows = torch.where(done, state.current, candidates.gather(1, probs.argmax(dim=1)[:, None]).squeeze(1))
+            for i in torch.nonzero(~done).flatten().tolist():
+                trajectories[i].append(int(next_rows[i]))
+            state = self.advance(state, next_rows)
+            done = done | (next_rows == target)
+        return trajectories
+
+    def rollout(self, path_ids, target_id, mcg, unit_type, max_steps=50):
+        """Greedy continuation of ``path_ids`` towards ``target_id`` as hex ids"""
+        neighbors, neighbor_mask = self.neighbor_table(mcg, unit_type)
+        row_hexes = {self.hex_to_int(hex_id): hex_id for hex_id in mcg[unit_type]}
+        context = torch.tensor([[self.hex_to_int(h) for h in path_ids]], dtype=torch.long)
+        target = torch.tensor([self.hex_to_int(target_id)], dtype=torch.long)
+        lengths = torch.tensor([len(path_ids)], dtype=torch.long)
+        rows = self.rollout_batch(context, lengths, target, neighbors, neighbor_mask, max_steps)[0]
+        return [row_hexes[row] for row in rows]
 
-                for context, true_next_hex, goal in zip(context_batch, target_hex_batch, goal_batch):
-                    context = list(context)
-                    candidate_ids, probs = self(context, goal, dataset.mcg, dataset.unit_type)
+    def export(self, mcg, unit_type):
+        """``ExportedMFLMT`` for one unit type, with the map baked in; script it with ``torch.jit.script``"""
+        neighbors, neighbor_mask = self.neighbor_table(mcg, unit_type)
+        hex_index = {hex_id: self.hex_to_int(hex_id) for hex_id in mcg[unit_type]}
+        return ExportedMFLMT(self, hex_index, neighbors, neighbor_mask)
 
-                    if probs is None or true_next_hex not in candidate_ids:
-                        continue
+    def save_torchscript(self, mcg, unit_type, path):
+        """TorchScript artifact that ``torch.jit.load`` opens without this package"""
+        scripted = torch.jit.script(self.export(mcg, unit_type).eval())
+        scripted.save(path)
+        print(f"💾 TorchScript model saved to {path}")
+        return scripted
 
-                    true_idx = candidate_ids.index(true_next_hex)
-                    target = torch.tensor([true_idx], dtype=torch.long, device=probs.device)
-                    loss += loss_fn(probs.unsqueeze(0), target)
+    def batch_loss(self, context, lengths, target, true_idx, neighbors, neighbor_mask):
+        """Summed loss of a batch; like the old per-sample loop, CrossEntropy is taken on the probabilities"""
+        _, probs = self.forward_batch(context, lengths, target, neighbors, neighbor_mask)
+        mask = neighbor_mask[context.gather(1, (lengths - 1)[:, None]).squeeze(1)]
+        return F.cross_entropy(probs.masked_fill(~mask, float("-inf")), true_idx, reduction="sum")
 
-                if loss > 0:
-                    loss.backward()
+    def neighbor_table(self, mcg, unit_type, num_rows=None):
+        """``[N, K]`` embedding indices of each hex's MCG neighbors and their mask, in MCG order"""
+        graph = mcg.get(unit_type, {})
+        rows = {self.hex_to_int(hex_id): [self.hex_to_int(n) for n in row] for hex_id, row in graph.items()}
+        num_rows = num_rows or self.hex_embed.num_embeddings
+        width = max((len(row) for row in rows.values()), default=1)
+        neighbors = torch.zeros((num_rows, width), dtype=torch.long)
+        mask = torch.zeros((num_rows, width), dtype=torch.bool)
+        for idx, row in rows.items():
+            neighbors[idx, :len(row)] = torch.tensor(row, dtype=torch.long)
+            mask[idx, :len(row)] = True
+        return neighbors, mask
+
+    def dataset_rows(self, dataset):
+        """Embedding row of every hex index of the dataset"""
+        return torch.tensor([self.hex_to_int(h) for h in dataset.hex_ids], dtype=torch.long)
+
+    def prepare_batch(self, batch, rows, neighbors, neighbor_mask):
+        """Collated dataset batch -> ``(context, lengths, target, true_idx)`` in embedding rows.
+
+        ``true_idx`` is the slot of the real next hex among the candidates;
+        samples where it is not a candidate are dropped.
+        """
+        context, lengths, masked, target = batch
+        context, masked, target = rows[context], rows[masked], rows[target]
+        current = context.gather(1, (lengths - 1)[:, None]).squeeze(1)
+        hits = (neighbors[current] == masked[:, None]) & neighbor_mask[current]
+        keep = hits.any(dim=1)
+        return context[keep], lengths[keep], target[keep], hits[keep].int().argmax(dim=1)
+
+    def train_mflmt(self, dataset, epochs=5, batch_size=64, lr=1e-3, model_dir="models", model_name="mflmt.pt",
+                    world_size=1, num_workers=0):
+        """
+        world_size: > 1 trains in that many CPU processes with all-reduced gradients
+                    (see ``ai_commander.distributed.train_distributed``)
+        num_workers: data-loading processes per training process
+        """
+        full_path = os.path.join(model_dir, model_name)
+        if world_size > 1:
+            os.makedirs(model_dir, exist_ok=True)
+            train_distributed(self, dataset, world_size, epochs, batch_size, lr, full_path, num_workers)
+            print(f"💾 Model saved to {full_path}")
+            return
+
+        neighbors, neighbor_mask = self.neighbor_table(dataset.mcg, dataset.unit_type)
+        rows = self.dataset_rows(dataset)
+        sampler = LengthBucketSampler(dataset.context_lengths(), batch_size)
+        dataloader = DataLoader(
+            dataset, batch_sampler=sampler, collate_fn=collate_paths,
+            num_workers=num_workers, persistent_workers=num_workers > 0,
+        )
+        optimizers = self.optimizers(lr)
+
+        for epoch in range(epochs):
+            total_loss = 0
+            for batch in tqdm(dataloader, desc=f"Epoch {epoch+1}"):
+                context, lengths, target, true_idx = self.prepare_batch(batch, rows, neighbors, neighbor_mask)
+                if len(true_idx) == 0:
+                    continue
+                loss = self.batch_loss(context, lengths, target, true_idx, neighbors, neighbor_mask)
+
+                loss.backward()
+                for optimizer in optimizers:
                     optimizer.step()
                     optimizer.zero_grad()
-                    total_loss += loss.item()
+                total_loss += loss.item()
 
             print(f"✅ Epoch {epoch+1} Loss: {total_loss:.4f}")
 
         # 🔽 Zapisz model
         os.makedirs(model_dir, exist_ok=True)
-        full_path = os.path.join(model_dir, model_name)
-        torch.save(self.state_dict(), full_path)
-        print(f"💾 Model saved to {full_path}")
\ No newline at end of file
+        self.save_checkpoint(full_path)
+        print(f"💾 Model saved to {full_path}")
+
+class ExportedMFLMT(nn.Module):
+    """Pure-tensor M-FLMT for one map and unit type, scriptable with TorchScript.
+
+    The neighbor table is a buffer and the hex id mapping a plain dict
+    attribute, so ``forward(context_idx, lengths, goal_idx)`` needs no MCG
+    and ``hex_index`` / ``hex_id`` translate ids inside the artifact.
+    Outputs match ``forward_batch``.
+    """
+
+    def __init__(self, model, hex_index, neighbors, neighbor_mask):
+        super().__init__()
+        self.hex_embed = nn.Embedding.from_pretrained(model.hex_embed.weight.detach().clone(), freeze=True)
+        self.linear_path = copy.deepcopy(model.linear_path)
+        self.linear_target = copy.deepcopy(model.linear_target)
+        self.output_layer = copy.deepcopy(model.output_layer)
+        self.register_buffer("neighbors", neighbors)
+        self.register_buffer("neighbor_mask", neighbor_mask)
+        self.hex_to_row: Dict[str, int] = dict(hex_index)
+        row_to_hex = [""] * len(neighbors)
+        for hex_id, row in hex_index.items():
+            row_to_hex[row] = hex_id
+        self.row_to_hex: List[str] = row_to_hex
+
+    def forward(self, context_idx, lengths, goal_idx):
+        """``(candidates [B, K], probs [B, K])`` for padded ``[B, L]`` context rows"""
+        positions = torch.arange(context_idx.shape[1], device=context_idx.device)
+        valid = (positions[None, :] < lengths[:, None]).unsqueeze(-1)
+        path_sum = (self.hex_embed(context_idx) * valid).sum(dim=1)
+        combined_context = self.linear_path(path_sum / lengths[:, None]) + self.linear_target(self.hex_embed(goal_idx))
+
+        current = context_idx.gather(1, (lengths - 1)[:, None]).squeeze(1)
+        candidates, mask = self.neighbors[current], self.neighbor_mask[current]
+        scores = self.output_layer(F.relu(self.hex_embed(candidates) + combined_context[:, None, :])).squeeze(-1)
+        probs = F.softmax(scores.masked_fill(~mask, float("-inf")), dim=1)
+        return candidates, probs.nan_to_num(0.0)
+
+    @torch.jit.export
+    def hex_index(self, hex_ids: List[str]) -> torch.Tensor:
+        return torch.tensor([self.hex_to_row[hex_id] for hex_id in hex_ids], dtype=torch.long)
+
+    @torch.jit.export
+    def hex_id(self, rows: List[int]) -> List[str]:
+        return [self.row_to_hex[row] for row in rows]
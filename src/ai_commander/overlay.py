@@ -0,0 +1,85 @@
+import numpy as np
+
+from ai_commander.compact_mcg import as_compact
+from ai_commander.mcg import EVEN_COLUMN_DIRECTIONS, ODD_COLUMN_DIRECTIONS, MovementCostGraphBuilder
+
+
+class MovementOverlay:
+    """Enemy occupancy and zones of control on top of a static MCG.
+
+    Hexes holding an enemy unit are blocked; every hex in an enemy zone of
+    control (the unit's hex and its six neighbors) costs ``zoc_penalty`` extra
+    movement points to enter. Moving a unit only touches the hexes around its
+    old and new position, so the base graph is never copied or rebuilt. Keep
+    one overlay per moving side, holding the units of its enemies.
+    """
+
+    def __init__(self, mcg, zoc_penalty=1.0):
+        self.zoc_penalty = zoc_penalty
+        self.units = {}
+        self.version = 0
+        self.set_numbering(as_compact(mcg))
+
+    def set_numbering(self, mcg):
+        self.mcg = mcg
+        self.hex_ids = mcg.hex_ids
+        self.hex_index = mcg.hex_index
+        # Listy Pythona, bo wyszukiwania czytają je krawędź po krawędzi
+        self.occupants = [0] * mcg.num_hexes
+        self.zoc = [0] * mcg.num_hexes
+        self.blocked = [False] * mcg.num_hexes
+        self.penalty = [0.0] * mcg.num_hexes
+
+    def renumber(self, mcg):
+        """Move every unit to the hex numbering of ``mcg`` (see ``compact_mcg.reload_compact``)"""
+        if mcg.hex_ids == self.hex_ids:
+            return
+        positions = {unit_id: self.hex_ids[idx] for unit_id, idx in self.units.items()}
+        self.set_numbering(mcg)
+        self.units = {}
+        for unit_id, hex_id in positions.items():
+            self.place(unit_id, hex_id)
+
+    def zone(self, idx):
+        col, row = MovementCostGraphBuilder.parse_hex_id(self.hex_ids[idx])
+        digits = len(self.hex_ids[idx]) // 2
+        directions = ODD_COLUMN_DIRECTIONS if col % 2 == 1 else EVEN_COLUMN_DIRECTIONS
+        zone = [idx]
+        for dc, dr in directions:
+            neighbor = self.hex_index.get(MovementCostGraphBuilder.to_hex_id(col + dc, row + dr, digits))
+            if neighbor is not None:
+                zone.append(neighbor)
+        return zone
+
+    def _update(self, idx, delta):
+        self.occupants[idx] += delta
+        self.blocked[idx] = self.occupants[idx] > 0
+        for hex_idx in self.zone(idx):
+            self.zoc[hex_idx] += delta
+            self.penalty[hex_idx] = self.zoc_penalty if self.zoc[hex_idx] > 0 else 0.0
+        self.version += 1
+
+    def place(self, unit_id, hex_id):
+        if unit_id in self.units:
+            raise ValueError(f"Unit {unit_id} is already on the map")
+        idx = self.hex_index[hex_id]
+        self.units[unit_id] = idx
+        self._update(idx, +1)
+
+    def remove(self, unit_id):
+        self._update(self.units.pop(unit_id), -1)
+
+    def move(self, unit_id, hex_id):
+        # Najpierw sprawdzamy cel, żeby nieudany ruch nie zdjął jednostki z mapy
+        idx = self.hex_index[hex_id]
+        self._update(self.units[unit_id], -1)
+        self.units[unit_id] = idx
+        self._update(idx, +1)
+
+    def entry_cost(self, cost, to_idx):
+        """Cost of an MCG edge into ``to_idx`` with the overlay applied; ``inf`` when blocked"""
+        return np.inf if self.blocked[to_idx] else cost + self.penalty[to_idx]
+
+    def arrays(self):
+        """``(blocked, penalty)`` as numpy arrays, for vectorized consumers"""
+        return np.array(self.blocked, dtype=bool), np.array(self.penalty, dtype=np.float32)
@@ -0,0 +1,141 @@
+import heapq
+import math
+
+import numpy as np
+
+from ai_commander.compact_mcg import as_compact, edge_lists, reload_compact
+from ai_commander.components import ComponentIndex
+from ai_commander.mcg import MovementCostGraphBuilder, offset_to_cube
+
+
+class AStarPathfinder:
+    """Weighted A* over one unit type of the MCG.
+
+    The heuristic is hex distance times the cheapest edge of the unit type,
+    so it never overestimates and returned paths have minimal cost. Queries
+    between hexes in different components return ``None`` without searching.
+    An ``overlay`` (``MovementOverlay``) adds enemy ZOC penalties and blocks
+    occupied hexes; it only raises costs, so the heuristic stays admissible.
+    """
+
+    def __init__(self, mcg, unit_type, components=None, overlay=None):
+        self.source = mcg
+        self.mcg = as_compact(mcg)
+        self.unit_type = unit_type
+        self.owns_components = components is None
+        self.components = components or ComponentIndex(mcg, [unit_type])
+        self.overlay = overlay
+        self.set_numbering()
+        self.load_edges()
+
+    def set_numbering(self):
+        self.hex_ids = self.mcg.hex_ids
+        self.hex_index = self.mcg.hex_index
+        coords = np.array(
+            [MovementCostGraphBuilder.parse_hex_id(h) for h in self.hex_ids], dtype=np.int64
+        ).reshape(-1, 2)
+        x, y, z = offset_to_cube(coords[:, 0], coords[:, 1])
+        self.cube = list(zip(x.tolist(), y.tolist(), z.tolist()))
+
+    def load_edges(self):
+        graph = self.mcg.unit(self.unit_type)
+        self.offsets, self.neighbors, self.costs = edge_lists(graph)
+        self.min_cost = float(graph.costs.min()) if len(graph.costs) else 0.0
+
+    def invalidate_edges(self, changed):
+        """Re-read the unit's edges after ``MovementCostGraphBuilder.apply_changes``.
+
+        A component index the finder built itself is patched too; one passed
+        in belongs to the caller, who puts it in ``caches=`` as well.
+        """
+        if self.owns_components:
+            self.components.invalidate_edges(changed)
+        self.mcg, renumbered = reload_compact(self.source, self.hex_ids, self.overlay)
+        if renumbered:
+            self.set_numbering()
+        elif not any(unit_type == self.unit_type for unit_type, _, _ in changed):
+            return
+        self.load_edges()
+
+    def heuristic(self, idx, goal_idx):
+        x1, y1, z1 = self.cube[idx]
+        x2, y2, z2 = self.cube[goal_idx]
+        return max(abs(x1 - x2), abs(y1 - y2), abs(z1 - z2)) * self.min_cost
+
+    def search(self, start_idx, goal_idx, budget=None, rng=None, noise=0.0):
+        """A* on hex indices. Returns the index path or None.
+
+        budget: maximum movement points the path may spend
+        noise: with an ``rng``, every relaxed edge costs up to ``noise`` times
+               more, which gives varied near-optimal paths for training data
+        """
+        if not self.components.connected_indices(self.unit_type, start_idx, goal_idx):
+            return None
+        offsets, neighbors, costs = self.offsets, self.neighbors, self.costs
+        blocked = penalty = None
+        if self.overlay is not None:
+            blocked, penalty = self.overlay.blocked, self.overlay.penalty
+        g = {start_idx: 0.0}
+        spent = {start_idx: 0.0}
+        parent = {start_idx: -1}
+        closed = set()
+        heap = [(self.heuristic(start_idx, goal_idx), 0.0, start_idx)]
+        perturb = rng is not None and noise > 0
+
+        while heap:
+            _, g_current, current = heapq.heappop(heap)
+            if current == goal_idx:
+                return self.reconstruct(parent, goal_idx)
+            if current in closed:
+                continue
+            closed.add(current)
+
+            for e in range(offsets[current], offsets[current + 1]):
+                neighbor = neighbors[e]
+                if neighbor in closed:
+                    continue
+                cost = costs[e]
+                if blocked is not None:
+                    if blocked[neighbor]:
+                        continue
+                    cost += penalty[neighbor]
+                new_spent = spent[current] + cost
+                if budget is not None and new_spent > budget:
+                    continue
+                if perturb:
+                    cost *= 1.0 + noise * rng.random()
+                new_g = g_current + cost
+                if new_g < g.get(neighbor, math.inf):
+                    g[neighbor] = new_g
+                    spent[neighbor] = new_spent
+                    parent[neighbor] = current
+                    heapq.heappush(heap, (new_g + self.heuristic(neighbor, goal_idx), new_g, neighbor))
+        return None
+
+    @staticmethod
+    def reconstruct(parent, goal_idx):
+        path = []
+        node = goal_idx
+        while node != -1:
+            path.append(node)
+            node = parent[node]
+        path.reverse()
+        return path
+
+    def find_path(self, start, goal, budget=None, rng=None, noise=0.0):
+        if start not in self.hex_index or goal not in self.hex_index:
+            return None
+        path = self.search(self.hex_index[start], self.hex_index[goal], budget, rng, noise)
+        if path is None:
+            return None
+        return [self.hex_ids[i] for i in path]
+
+    def find_paths(self, pairs, budget=None, rng=None, noise=0.0):
+        """Paths for many ``(start, goal)`` pairs; ``None`` where no path exists"""
+        return [self.find_path(start, goal, budget, rng, noise) for start, goal in pairs]
+
+    def path_cost(self, path):
+        graph = self.mcg[self.unit_type]
+        if self.overlay is None:
+            return sum(graph[a][b] for a, b in zip(path, path[1:]))
+        return sum(self.overlay.entry_cost(graph[a][b], self.hex_index[b]) for a, b in zip(path, path[1:]))
@@ -0,0 +1,71 @@
+import io
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import default_dynamic_qconfig, float_qparams_weight_only_qconfig, quantize_dynamic
+from torch.utils.data import DataLoader
+
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+from ai_commander.PlayerPathDataset import collate_paths
+
+
+def quantize_model(model):
+    """Int8 copy of an M-FLMT for CPU inference.
+
+    ``hex_embed`` keeps one quint8 row per hex with its own scale, the
+    ``Linear`` layers get int8 weights with activations quantized on the
+    fly. The copy has the same methods (``forward``, ``forward_batch``,
+    rollouts); it cannot be trained further.
+    """
+    qconfig = {nn.Embedding: float_qparams_weight_only_qconfig, nn.Linear: default_dynamic_qconfig}
+    return quantize_dynamic(model.eval(), qconfig, dtype=torch.qint8, inplace=False)
+
+
+def load_quantized(path, mcg=None):
+    """Quantized model from a ``mflmt.pt`` checkpoint (see ``load_checkpoint``)"""
+    return quantize_model(ManueverabilityFirstLayerMapTensor.load_checkpoint(path, mcg=mcg))
+
+
+def model_size(model):
+    """Bytes of the serialized ``state_dict``"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+@torch.inference_mode()
+def accuracy_drift(reference, quantized, dataset, batch_size=256):
+    """Compare next-hex predictions of the float and the quantized model on held-out paths.
+
+    Returns the top-1 accuracy of both, how often their top-1 agrees, the
+    largest probability difference and the mean KL divergence.
+    """
+    neighbors, neighbor_mask = reference.neighbor_table(dataset.mcg, dataset.unit_type)
+    rows = reference.dataset_rows(dataset)
+    totals = {"samples": 0, "reference_hits": 0, "quantized_hits": 0, "agreement": 0, "kl": 0.0}
+    max_prob_diff = 0.0
+
+    for batch in DataLoader(dataset, batch_size=batch_size, collate_fn=collate_paths):
+        context, lengths, target, true_idx = reference.prepare_batch(batch, rows, neighbors, neighbor_mask)
+        if len(true_idx) == 0:
+            continue
+        _, p = reference.forward_batch(context, lengths, target, neighbors, neighbor_mask)
+        _, q = quantized.forward_batch(context, lengths, target, neighbors, neighbor_mask)
+        totals["samples"] += len(true_idx)
+        totals["reference_hits"] += int((p.argmax(dim=1) == true_idx).sum())
+        totals["quantized_hits"] += int((q.argmax(dim=1) == true_idx).sum())
+        totals["agreement"] += int((p.argmax(dim=1) == q.argmax(dim=1)).sum())
+        # Na pustych slotach p = 0, więc nic nie dodają
+        kl = torch.where(p > 0, p * (p.clamp_min(1e-12).log() - q.clamp_min(1e-12).log()), torch.zeros(()))
+        totals["kl"] += float(kl.sum())
+        max_prob_diff = max(max_prob_diff, float((p - q).abs().max()))
+
+    samples = max(totals["samples"], 1)
+    return {
+        "samples": totals["samples"],
+        "reference_accuracy": totals["reference_hits"] / samples,
+        "quantized_accuracy": totals["quantized_hits"] / samples,
+        "top1_agreement": totals["agreement"] / samples,
+        "max_prob_diff": max_prob_diff,
+        "mean_kl": totals["kl"] / samples,
+    }
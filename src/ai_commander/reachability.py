@@ -0,0 +1,116 @@
+import heapq
+import math
+
+import numpy as np
+
+from ai_commander.compact_mcg import as_compact, edge_lists, reload_compact
+
+# Koszty float32 (np. drogi 0.1) sumują się do 1.5000001 zamiast 1.5
+MP_EPSILON = 1e-5
+
+
+class ReachabilityEngine:
+    """Movement ranges: every hex a unit can reach with its movement points.
+
+    Each query is ``(unit_type, hex_id, mp)``. A bounded Dijkstra stops as
+    soon as the cheapest open hex costs more than ``mp``, and queries of the
+    same unit type from the same hex share one search run to their largest
+    ``mp``. With an ``overlay`` (``MovementOverlay``) occupied hexes are
+    never entered and ZOC penalties count against the budget.
+    """
+
+    def __init__(self, mcg, overlay=None):
+        self.source = mcg
+        self.mcg = as_compact(mcg)
+        self.overlay = overlay
+        self.hex_ids = self.mcg.hex_ids
+        self.hex_index = self.mcg.hex_index
+        self.num_hexes = self.mcg.num_hexes
+        self.edges = {}
+
+    def unit_edges(self, unit_type):
+        if unit_type not in self.edges:
+            self.edges[unit_type] = edge_lists(self.mcg.unit(unit_type))
+        return self.edges[unit_type]
+
+    def invalidate_edges(self, changed):
+        """Rebuild the edge lists of unit types changed by ``MovementCostGraphBuilder.apply_changes``"""
+        self.mcg, renumbered = reload_compact(self.source, self.hex_ids, self.overlay)
+        if renumbered:
+            self.hex_ids = self.mcg.hex_ids
+            self.hex_index = self.mcg.hex_index
+            self.num_hexes = self.mcg.num_hexes
+            stale = set(self.edges)
+        else:
+            stale = {unit_type for unit_type, _, _ in changed}
+        for unit_type in stale:
+            if self.edges.pop(unit_type, None) is not None:
+                self.unit_edges(unit_type)
+
+    def search(self, unit_type, start_idx, mp):
+        """Hex indices within ``mp`` of ``start_idx`` and their costs, cheapest first"""
+        offsets, neighbors, costs = self.unit_edges(unit_type)
+        blocked = penalty = None
+        if self.overlay is not None:
+            blocked, penalty = self.overlay.blocked, self.overlay.penalty
+        dist = {start_idx: 0.0}
+        settled, settled_costs = [], []
+        heap = [(0.0, start_idx)]
+        while heap:
+            d, current = heapq.heappop(heap)
+            if d > dist[current]:
+                continue
+            settled.append(current)
+            settled_costs.append(d)
+            for e in range(offsets[current], offsets[current + 1]):
+                neighbor = neighbors[e]
+                new_d = d + costs[e]
+                if blocked is not None:
+                    if blocked[neighbor]:
+                        continue
+                    new_d += penalty[neighbor]
+                if new_d <= mp + MP_EPSILON and new_d < dist.get(neighbor, math.inf):
+                    dist[neighbor] = new_d
+                    heapq.heappush(heap, (new_d, neighbor))
+        return np.array(settled, dtype=np.int32), np.array(settled_costs)
+
+    def reach(self, unit_type, start, mp):
+        """``(indices, remaining_mp)`` for one unit; see ``reach_batch``"""
+        return self.reach_batch([(unit_type, start, mp)])[0]
+
+    def reach_batch(self, queries):
+        """Movement ranges of many units at once.
+
+        Returns one ``(indices, remaining_mp)`` pair per query, in query order:
+        int32 hex indices (positions in ``hex_ids``) sorted by cost and the
+        float32 movement points left on arriving there.
+        """
+        queries = [(unit_type, self.hex_index[start], float(mp)) for unit_type, start, mp in queries]
+        budgets = {}
+        for unit_type, start_idx, mp in queries:
+            key = (unit_type, start_idx)
+            budgets[key] = max(budgets.get(key, -math.inf), mp)
+
+        searches = {key: self.search(*key, mp) for key, mp in budgets.items()}
+
+        results = []
+        for unit_type, start_idx, mp in queries:
+            indices, costs = searches[(unit_type, start_idx)]
+            # Koszty rosną, więc zasięg mniejszego budżetu to prefiks wyniku
+            end = np.searchsorted(costs, mp + MP_EPSILON, side="right")
+            results.append((indices[:end], np.maximum(mp - costs[:end], 0).astype(np.float32)))
+        return results
+
+    def bitsets(self, results):
+        """Pack ``reach_batch`` results into ``uint8[Q, ceil(N / 8)]``; bit ``i`` of row ``q`` is hex index ``i``"""
+        mask = np.zeros((len(results), self.num_hexes), dtype=bool)
+        for q, (indices, _) in enumerate(results):
+            mask[q, indices] = True
+        return np.packbits(mask, axis=1, bitorder="little")
+
+    def remaining(self, results):
+        """``float32[Q, N]`` movement points left per hex, ``-1`` where out of range"""
+        dense = np.full((len(results), self.num_hexes), -1, dtype=np.float32)
+        for q, (indices, left) in enumerate(results):
+            dense[q, indices] = left
+        return dense
@@ -1,8 +1,31 @@
 import json
 import re
 
+import numpy as np
+
+# Typowa komenda <jednostka><heks><AKCJA><jednostka><heks> w jednym dopasowaniu;
+# wszystko inne idzie przez ogólną ścieżkę część po części
+FIELD = r"([0-9A-Za-z]*)"
+UNIT = rf"<{FIELD}_{FIELD}_{FIELD}/{FIELD}/{FIELD}/{FIELD}>"
+COMMAND_PATTERN = re.compile(rf"{UNIT}<([0-9]+)><([A-Za-z]+)>{UNIT}<([0-9]+)>")
+PART_PATTERN = re.compile(r"<(.*?)>")
+
+
+UNIT_ROLES = ("COM", "BAT", "REG")
+HEX_ROLES = ("HEX_START", "HEX_END", "HEX")
+
+
 class Wb95Tokenizer:
-    def __init__(self, vocab_path: str = None):
+    """WB95 command tokenizer.
+
+    With ``factorized=True`` hexes become a role token plus ``COL_``/``ROW_``
+    tokens (``HEX_START COL_23 ROW_71``) and company, battalion and regiment a
+    role token plus a shared ``NUM_`` value (``COM NUM_1``), so the vocab does
+    not grow with the map or the order of battle. ``decode`` joins them back.
+    """
+
+    def __init__(self, vocab_path: str = None, factorized: bool = False):
+        self.factorized = factorized
         if vocab_path:
             with open(vocab_path, "r", encoding="utf-8") as f:
                 self.vocab = json.load(f)
@@ -14,34 +37,57 @@ class Wb95Tokenizer:
         self.unk_token = "<UNK>"
 
     def tokenize(self, command: str) -> list:
+        match = COMMAND_PATTERN.fullmatch(command)
+        if match is not None and self.factorized:
+            groups = match.groups()
+            return (
+                self.unit_tokens(*groups[0:6]) + self.hex_tokens(groups[6], 1) + [f"ACTION_{groups[7].upper()}"]
+                + self.unit_tokens(*groups[8:14]) + self.hex_tokens(groups[14], 4)
+            )
+        if match is not None:
+            (company, battalion, regiment, strength, manuever, movement, start_hex, action,
+             t_company, t_battalion, t_regiment, t_strength, t_manuever, t_movement, end_hex) = match.groups()
+            return [
+                f"COM_{company}", f"BAT_{battalion}", f"REG_{regiment}",
+                f"STR_{strength}", f"MAN_{manuever}", f"MOV_{movement}",
+                f"HEX_START_{start_hex}",
+                f"ACTION_{action.upper()}",
+                f"COM_{t_company}", f"BAT_{t_battalion}", f"REG_{t_regiment}",
+                f"STR_{t_strength}", f"MAN_{t_manuever}", f"MOV_{t_movement}",
+                f"HEX_END_{end_hex}",
+            ]
+
         tokens = []
+        for i, part in enumerate(PART_PATTERN.findall(command)):
+            self.classify_part(part, i, tokens)
+        return tokens
 
-        parts = re.findall(r"<(.*?)>", command)
-        for i, part in enumerate(parts):
-            if "/" in part and "_" in part:
-                company, battalion, regiment = part.split("/")[0].split("_")
-                strength, manuever, movement = part.split("/")[1:]
-                tokens.extend([
-                    f"COM_{company}",
-                    f"BAT_{battalion}",
-                    f"REG_{regiment}",
-                    f"STR_{strength}",
-                    f"MAN_{manuever}",
-                    f"MOV_{movement}"
-                ])
-            elif part.isdigit():
-                if i == 1:
-                    tokens.append(f"HEX_START_{part}")
-                elif i == 4:
-                    tokens.append(f"HEX_END_{part}")
-                else:
-                    tokens.append(f"HEX_{part}")
-            elif part.isalpha():
-                tokens.append(f"ACTION_{part.upper()}")
-            else:
-                tokens.append(part)
+    def unit_tokens(self, company, battalion, regiment, strength, manuever, movement):
+        if self.factorized:
+            head = ["COM", f"NUM_{company}", "BAT", f"NUM_{battalion}", "REG", f"NUM_{regiment}"]
+        else:
+            head = [f"COM_{company}", f"BAT_{battalion}", f"REG_{regiment}"]
+        return head + [f"STR_{strength}", f"MAN_{manuever}", f"MOV_{movement}"]
 
-        return tokens
+    def hex_tokens(self, part, i):
+        role = "HEX_START" if i == 1 else "HEX_END" if i == 4 else "HEX"
+        if self.factorized:
+            half = len(part) // 2
+            return [role, f"COL_{part[:half]}", f"ROW_{part[half:]}"]
+        return [f"{role}_{part}"]
+
+    def classify_part(self, part, i, tokens):
+        """Tokens of the ``i``-th ``<part>`` of a command, appended to ``tokens``"""
+        if "/" in part and "_" in part:
+            company, battalion, regiment = part.split("/")[0].split("_")
+            strength, manuever, movement = part.split("/")[1:]
+            tokens.extend(self.unit_tokens(company, battalion, regiment, strength, manuever, movement))
+        elif part.isdigit():
+            tokens.extend(self.hex_tokens(part, i))
+        elif part.isalpha():
+            tokens.append(f"ACTION_{part.upper()}")
+        else:
+            tokens.append(part)
 
     def convert_tokens_to_ids(self, tokens: list) -> list:
         return [self.vocab.get(token, self.vocab[self.unk_token]) for token in tokens]
@@ -54,13 +100,79 @@ class Wb95Tokenizer:
             "attention_mask": [1] * len(input_ids)
         }
 
+    def batch_encode(self, commands, max_length=None, padding="longest", return_tensors="pt"):
+        """Encode many commands into padded ``[batch, length]`` id and mask arrays.
+
+        padding: ``"longest"`` pads to the longest command (capped at
+                 ``max_length``), ``"max_length"`` always to ``max_length``
+        return_tensors: ``"pt"`` for torch tensors, ``"np"`` for numpy arrays
+        Longer commands are truncated to ``max_length``. Ids are the same as
+        ``convert_tokens_to_ids(tokenize(command))``.
+        """
+        if padding not in ("longest", "max_length"):
+            raise ValueError(f"Unknown padding {padding}")
+        if padding == "max_length" and max_length is None:
+            raise ValueError("padding='max_length' needs max_length")
+
+        vocab = self.vocab
+        unk_id = vocab[self.unk_token]
+
+        def encode(command):
+            return [vocab.get(token, unk_id) for token in self.tokenize(command)]
+
+        commands = list(commands)
+        if padding == "max_length":
+            # Szerokość znana z góry: każdy wiersz idzie prosto do tablicy
+            length = max_length
+            rows = map(encode, commands)
+        else:
+            rows = [encode(command) for command in commands]
+            length = max((len(ids) for ids in rows), default=0)
+            if max_length is not None:
+                length = min(length, max_length)
+
+        input_ids = np.full((len(commands), length), vocab.get(self.pad_token, 0), dtype=np.int32)
+        attention_mask = np.zeros((len(commands), length), dtype=np.int32)
+        for row, ids in enumerate(rows):
+            ids = ids[:length]
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+
+        if return_tensors == "pt":
+            import torch
+            return {"input_ids": torch.from_numpy(input_ids), "attention_mask": torch.from_numpy(attention_mask)}
+        if return_tensors == "np":
+            return {"input_ids": input_ids, "attention_mask": attention_mask}
+        raise ValueError(f"Unknown return_tensors {return_tensors}")
+
     def decode(self, ids: list) -> str:
-        return " ".join(self.id2token.get(i, self.unk_token) for i in ids)
+        tokens = [self.id2token.get(i, self.unk_token) for i in ids]
+        if self.factorized:
+            tokens = self.join_factorized(tokens)
+        return " ".join(tokens)
+
+    @staticmethod
+    def join_factorized(tokens):
+        """``COM NUM_1`` -> ``COM_1`` and ``HEX_END COL_23 ROW_72`` -> ``HEX_END_2372``"""
+        joined = []
+        i = 0
+        while i < len(tokens):
+            token, rest = tokens[i], tokens[i + 1:i + 3]
+            if token in UNIT_ROLES and rest and rest[0].startswith("NUM_"):
+                joined.append(f"{token}_{rest[0][4:]}")
+                i += 2
+            elif token in HEX_ROLES and len(rest) == 2 and rest[0].startswith("COL_") and rest[1].startswith("ROW_"):
+                joined.append(f"{token}_{rest[0][4:]}{rest[1][4:]}")
+                i += 3
+            else:
+                joined.append(token)
+                i += 1
+        return joined
 
     def save_vocab(self, path: str):
         with open(path, "w", encoding="utf-8") as f:
             json.dump(self.vocab, f, ensure_ascii=False, indent=4)
 
     @classmethod
-    def from_pretrained(cls, path: str):
-        return cls(path)
\ No newline at end of file
+    def from_pretrained(cls, path: str, factorized: bool = False):
+        return cls(path, factorized)
\ No newline at end of file
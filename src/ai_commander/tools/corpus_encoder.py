@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from ai_commander.tokenizer import Wb95Tokenizer
+
+CHUNK_LINES = 65_536
+SHARD_TOKENS = 64 * 1024 * 1024
+CACHE_SIZE = 100_000
+INDEX_DTYPE = np.dtype([("shard", "<u4"), ("length", "<u4"), ("start", "<u8")])
+
+_worker_encoder = None
+
+
+def _init_worker(vocab_path, cache_size, factorized):
+    global _worker_encoder
+    _worker_encoder = CommandEncoder(vocab_path, cache_size, factorized)
+
+
+def _encode_chunk(commands):
+    return _worker_encoder.encode_chunk(commands)
+
+
+def corpus_files(base_path):
+    return {
+        "manifest": f"{base_path}.json",
+        "index": f"{base_path}.idx",
+    }
+
+
+def shard_path(base_path, shard):
+    return f"{base_path}.{shard:05d}.tok"
+
+
+def token_dtype(vocab_size):
+    return np.dtype("<u2") if vocab_size <= 2 ** 16 else np.dtype("<i4")
+
+
+def iter_chunks(input_paths, chunk_lines=CHUNK_LINES):
+    """Stream non-empty command lines from one or more files in lists of ``chunk_lines``"""
+    if isinstance(input_paths, (str, os.PathLike)):
+        input_paths = [input_paths]
+    chunk = []
+    for input_path in input_paths:
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                chunk.append(line)
+                if len(chunk) == chunk_lines:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+class CommandEncoder:
+    """Tokenizer plus an LRU cache of whole commands, which repeat a lot within a game"""
+
+    def __init__(self, vocab_path, cache_size=CACHE_SIZE, factorized=False):
+        self.tokenizer = Wb95Tokenizer(vocab_path, factorized)
+        self.encode = lru_cache(maxsize=cache_size)(self._encode)
+
+    def _encode(self, command):
+        return tuple(self.tokenizer.convert_tokens_to_ids(self.tokenizer.tokenize(command)))
+
+    def encode_chunk(self, commands):
+        """``(ids, lengths)``: all ids of the chunk back to back and the id count per command"""
+        encoded = [self.encode(command) for command in commands]
+        lengths = np.fromiter((len(ids) for ids in encoded), dtype=np.uint32, count=len(encoded))
+        ids = np.fromiter((i for ids in encoded for i in ids), dtype=np.int64, count=int(lengths.sum()))
+        return ids, lengths
+
+
+def encode_corpus(input_paths, output_base, vocab_path, workers=1, chunk_lines=CHUNK_LINES,
+                  shard_tokens=SHARD_TOKENS, cache_size=CACHE_SIZE, factorized=False):
+    """Tokenize command files into memory-mappable token shards.
+
+    Writes ``{output_base}.00000.tok``... (ids back to back, ``uint16`` or
+    ``int32`` depending on the vocab size), ``{output_base}.idx`` (shard,
+    length and start of every command) and a ``{output_base}.json`` manifest.
+    Input is read in chunks of ``chunk_lines`` and tokenized by ``workers``
+    processes; commands keep their input order. Returns the command count.
+    """
+    with open(vocab_path, "r", encoding="utf-8") as f:
+        dtype = token_dtype(len(json.load(f)))
+    files = corpus_files(output_base)
+    chunks = iter_chunks(input_paths, chunk_lines)
+
+    shards, shard, shard_file, position = [], -1, None, shard_tokens
+    commands = tokens = 0
+    with open(files["index"], "wb") as index:
+        if workers <= 1:
+            encoder = CommandEncoder(vocab_path, cache_size, factorized)
+            results = (encoder.encode_chunk(chunk) for chunk in chunks)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(vocab_path, cache_size, factorized))
+            results = pool.imap(_encode_chunk, chunks)
+
+        try:
+            for ids, lengths in results:
+                starts = np.cumsum(lengths, dtype=np.uint64) - lengths
+                done = 0
+                while done < len(lengths):
+                    if position >= shard_tokens:
+                        if shard_file is not None:
+                            shard_file.close()
+                        shard += 1
+                        shards.append(os.path.basename(shard_path(output_base, shard)))
+                        shard_file = open(shard_path(output_base, shard), "wb")
+                        position = 0
+                    # Ile komend zmieści się jeszcze w tym shardzie (zawsze co najmniej jedna)
+                    ends = starts[done:] + lengths[done:] - starts[done]
+                    take = max(1, int(np.searchsorted(ends, shard_tokens - position, side="right")))
+                    records = np.zeros(take, dtype=INDEX_DTYPE)
+                    records["shard"] = shard
+                    records["length"] = lengths[done:done + take]
+                    records["start"] = position + starts[done:done + take] - starts[done]
+                    index.write(records.tobytes())
+                    first, last = int(starts[done]), int(starts[done + take - 1] + lengths[done + take - 1])
+                    shard_file.write(ids[first:last].astype(dtype).tobytes())
+                    position += last - first
+                    done += take
+                commands += len(lengths)
+                tokens += len(ids)
+        finally:
+            if pool is not None:
+                pool.terminate()
+            if shard_file is not None:
+                shard_file.close()
+
+    with open(files["manifest"], "w") as f:
+        json.dump({
+            "dtype": dtype.str, "shards": shards, "commands": commands, "tokens": tokens, "factorized": factorized,
+        }, f, indent=2)
+    print(f"✅ {commands} commands encoded to ➡️ {output_base}")
+    return commands
+
+
+class TokenCorpusReader:
+    """Memory-mapped token corpus: ``corpus[k]`` is the id array of command *k*"""
+
+    def __init__(self, base_path):
+        files = corpus_files(base_path)
+        with open(files["manifest"]) as f:
+            self.manifest = json.load(f)
+        directory = os.path.dirname(base_path)
+        dtype = np.dtype(self.manifest["dtype"])
+        self.shards = [
+            np.memmap(os.path.join(directory, name), dtype=dtype, mode="r")
+            if os.path.getsize(os.path.join(directory, name)) else np.zeros(0, dtype)
+            for name in self.manifest["shards"]
+        ]
+        count = self.manifest["commands"]
+        self.index = np.memmap(files["index"], dtype=INDEX_DTYPE, mode="r", shape=(count,)) if count else np.zeros(0, INDEX_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, k):
+        if not -len(self) <= k < len(self):
+            raise IndexError(k)
+        record = self.index[k]
+        start = int(record["start"])
+        return self.shards[int(record["shard"])][start:start + int(record["length"])]
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
@@ -3,6 +3,7 @@ import os
 import random
 from pathlib import Path
 from ai_commander.tools.name_generator import generate_readable_name
+from ai_commander.mcg import MovementCostGraphBuilder, hex_id_digits
 
 class RandomMapGenerator:
     def __init__(self, width=10, height=10):
@@ -30,7 +31,7 @@ class RandomMapGenerator:
         }
 
     def format_hex_id(self, col, row):
-        return f"{col:02}{row:02}"
+        return MovementCostGraphBuilder.to_hex_id(col, row, hex_id_digits(self.width, self.height))
 
     def get_neighbors(self, col, row):
         if col % 2 == 0:
@@ -78,7 +79,7 @@ class RandomMapGenerator:
 
         for _ in range(20):
             h1 = random.choice(hex_ids)
-            col, row = int(h1[:2]), int(h1[2:])
+            col, row = MovementCostGraphBuilder.parse_hex_id(h1)
             neighbors = self.get_neighbors(col, row)
             if not neighbors:
                 continue
@@ -117,7 +118,7 @@ class RandomMapGenerator:
         river_id = 0
         for _ in range(int(self.width * self.height * 0.05)):
             h1 = random.choice(hex_ids)
-            col, row = int(h1[:2]), int(h1[2:])
+            col, row = MovementCostGraphBuilder.parse_hex_id(h1)
             neighbors = self.get_neighbors(col, row)
             if not neighbors:
                 continue
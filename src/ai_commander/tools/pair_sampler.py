@@ -0,0 +1,137 @@
+import numpy as np
+
+from ai_commander.compact_mcg import as_compact
+from ai_commander.components import component_labels
+from ai_commander.mcg import MovementCostGraphBuilder, hex_distance
+
+DENSE_LIMIT = 10_000_000
+MAX_ROUNDS = 64
+# Koszt po drogach bywa poniżej 1 (np. 0.5), więc biny kosztu zaczynają się od 0
+DEFAULT_BINS = {
+    "distance": [1, 3, 6, 10, 15, np.inf],
+    "cost": [0, 1, 3, 6, 10, 15, np.inf],
+}
+
+
+class PairSampler:
+    """Unique (start, goal) pairs drawn from the hexes of an MCG.
+
+    With ``reachable_only`` a goal is always drawn from the start's connected
+    component, so no search is wasted on pairs that can never succeed. Pairs
+    are uniform over all valid pairs unless ``stratify`` spreads them evenly
+    over bins of hex distance (``"distance"``) or movement cost (``"cost"``,
+    needs ``distance_fields``).
+    """
+
+    def __init__(self, mcg, unit_type, seed=None, reachable_only=True, distance_fields=None, components=None):
+        self.mcg = as_compact(mcg)
+        self.unit_type = unit_type
+        self.hex_ids = self.mcg.hex_ids
+        self.num_hexes = self.mcg.num_hexes
+        self.rng = np.random.default_rng(seed)
+        self.distance_fields = distance_fields
+
+        if reachable_only and components is not None:
+            labels = components.labels[unit_type]
+        elif reachable_only:
+            labels = component_labels(self.mcg.unit(unit_type), self.num_hexes)
+        else:
+            labels = np.zeros(self.num_hexes, dtype=np.int64)
+        self.set_labels(labels)
+
+        coords = np.array(
+            [MovementCostGraphBuilder.parse_hex_id(h) for h in self.hex_ids], dtype=np.int64
+        ).reshape(-1, 2)
+        self.cols, self.rows = coords[:, 0], coords[:, 1]
+
+    def set_labels(self, labels):
+        self.labels = labels
+        # Heksy posortowane po komponencie: członkowie komponentu leżą obok siebie
+        self.members = np.argsort(labels, kind="stable")
+        _, first, sizes = np.unique(labels[self.members], return_index=True, return_counts=True)
+        component = np.repeat(np.arange(len(sizes)), sizes)
+        self.component_start = first[component][np.argsort(self.members)]
+        self.component_size = sizes[component][np.argsort(self.members)]
+        self.position = np.empty(self.num_hexes, dtype=np.int64)
+        self.position[self.members] = np.arange(self.num_hexes) - first[component]
+        self.start_weights = (self.component_size - 1).astype(np.float64)
+        self.total_pairs = int(self.start_weights.sum())
+
+    def draw(self, size):
+        """``size`` random valid pairs (may repeat), as hex index arrays"""
+        starts = self.rng.choice(self.num_hexes, size=size, p=self.start_weights / self.total_pairs)
+        offset = self.rng.integers(0, self.component_size[starts] - 1)
+        offset += offset >= self.position[starts]
+        goals = self.members[self.component_start[starts] + offset]
+        return starts, goals
+
+    def all_pairs(self):
+        keys = [
+            np.add.outer(group * self.num_hexes, group).ravel()
+            for group in np.split(self.members, np.flatnonzero(np.diff(self.labels[self.members])) + 1)
+            if len(group) > 1
+        ]
+        keys = np.concatenate(keys) if keys else np.zeros(0, dtype=np.int64)
+        return keys[keys // self.num_hexes != keys % self.num_hexes]
+
+    def measure(self, keys, stratify):
+        starts, goals = keys // self.num_hexes, keys % self.num_hexes
+        if stratify == "distance":
+            return hex_distance(self.cols[starts], self.rows[starts], self.cols[goals], self.rows[goals])
+        if stratify == "cost":
+            return self.distance_fields.distances[self.unit_type][starts, goals]
+        raise ValueError(f"Unknown stratification {stratify}")
+
+    def sample_indices(self, count, stratify=None, bins=None):
+        if self.total_pairs == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        if stratify is None:
+            keys = self.sample_uniform(min(count, self.total_pairs))
+        else:
+            keys = self.sample_stratified(count, stratify, bins)
+        keys = self.rng.permutation(keys)
+        return keys // self.num_hexes, keys % self.num_hexes
+
+    def sample_uniform(self, count):
+        if count > self.total_pairs // 2 and self.total_pairs <= DENSE_LIMIT:
+            return self.rng.choice(self.all_pairs(), size=count, replace=False)
+
+        keys = np.zeros(0, dtype=np.int64)
+        while len(keys) < count:
+            starts, goals = self.draw(int((count - len(keys)) * 1.2) + 16)
+            keys = np.union1d(keys, starts * self.num_hexes + goals)
+        return self.rng.choice(keys, size=count, replace=False)
+
+    def sample_stratified(self, count, stratify, bins):
+        """Equal share of ``count`` per bin; a bin with too few pairs (or too rare after ``MAX_ROUNDS`` draws) comes up short"""
+        bins = np.asarray(bins if bins is not None else DEFAULT_BINS[stratify], dtype=np.float64)
+        num_bins = len(bins) - 1
+        quota = np.full(num_bins, count // num_bins) + (np.arange(num_bins) < count % num_bins)
+
+        if self.total_pairs <= DENSE_LIMIT:
+            candidates = self.all_pairs()
+            strata = np.digitize(self.measure(candidates, stratify), bins) - 1
+            keys = [
+                self.rng.choice(candidates[strata == b], size=min(quota[b], np.count_nonzero(strata == b)), replace=False)
+                for b in range(num_bins)
+            ]
+            return np.concatenate(keys)
+
+        keys = [np.zeros(0, dtype=np.int64) for _ in range(num_bins)]
+        for _ in range(MAX_ROUNDS):
+            missing = quota - np.array([len(k) for k in keys])
+            if not missing.any():
+                break
+            starts, goals = self.draw(int(missing.sum() * num_bins * 2))
+            drawn = starts * self.num_hexes + goals
+            strata = np.digitize(self.measure(drawn, stratify), bins) - 1
+            for b in np.flatnonzero(missing):
+                keys[b] = np.union1d(keys[b], drawn[strata == b])
+                if len(keys[b]) > quota[b]:
+                    keys[b] = self.rng.choice(keys[b], size=quota[b], replace=False)
+        return np.concatenate(keys)
+
+    def sample(self, count, stratify=None, bins=None):
+        starts, goals = self.sample_indices(count, stratify, bins)
+        return [(self.hex_ids[s], self.hex_ids[g]) for s, g in zip(starts.tolist(), goals.tolist())]
@@ -0,0 +1,163 @@
+import json
+import os
+
+import numpy as np
+
+from ai_commander.mcg import EVEN_COLUMN_DIRECTIONS, ODD_COLUMN_DIRECTIONS, MovementCostGraphBuilder
+
+MAGIC = b"WBPATH01"
+HEADER_SIZE = len(MAGIC) + 4
+RECORD_HEADER = np.dtype([("col", "<u2"), ("row", "<u2"), ("steps", "<u4")])
+
+# Kierunek ruchu -> kod 0..5; dc jest taki sam dla obu parzystości kolumny
+DIRECTION_DC = np.array([dc for dc, _ in ODD_COLUMN_DIRECTIONS], dtype=np.int64)
+ODD_DR = np.array([dr for _, dr in ODD_COLUMN_DIRECTIONS], dtype=np.int64)
+EVEN_DR = np.array([dr for _, dr in EVEN_COLUMN_DIRECTIONS], dtype=np.int64)
+DIRECTION_CODES = {
+    (parity, dc, dr): code
+    for parity, directions in ((1, ODD_COLUMN_DIRECTIONS), (0, EVEN_COLUMN_DIRECTIONS))
+    for code, (dc, dr) in enumerate(directions)
+}
+
+
+def corpus_files(base_path):
+    return {
+        "data": f"{base_path}.bin",
+        "index": f"{base_path}.idx",
+        "progress": f"{base_path}.progress.json",
+    }
+
+
+def encode_path(path):
+    """One record: start column and row, step count and 3-bit direction codes"""
+    coords = [MovementCostGraphBuilder.parse_hex_id(hex_id) for hex_id in path]
+    codes = []
+    for (col, row), (n_col, n_row) in zip(coords, coords[1:]):
+        code = DIRECTION_CODES.get((col % 2, n_col - col, n_row - row))
+        if code is None:
+            raise ValueError(f"Hexes {col, row} and {n_col, n_row} are not adjacent")
+        codes.append(code)
+
+    header = np.zeros(1, dtype=RECORD_HEADER)
+    header["col"], header["row"] = coords[0]
+    header["steps"] = len(codes)
+    codes = np.asarray(codes, dtype=np.uint8)
+    bits = ((codes[:, None] >> np.array([2, 1, 0], dtype=np.uint8)) & 1).ravel()
+    return header.tobytes() + np.packbits(bits).tobytes()
+
+
+def decode_path(buffer, offset, digits):
+    header = buffer[offset:offset + RECORD_HEADER.itemsize].view(RECORD_HEADER)[0]
+    steps = int(header["steps"])
+    start = offset + RECORD_HEADER.itemsize
+    packed = buffer[start:start + (3 * steps + 7) // 8]
+    codes = np.unpackbits(packed)[:3 * steps].reshape(steps, 3) @ np.array([4, 2, 1])
+
+    cols = int(header["col"]) + np.concatenate([[0], np.cumsum(DIRECTION_DC[codes])])
+    odd = cols[:-1] % 2 == 1
+    rows = int(header["row"]) + np.concatenate([[0], np.cumsum(np.where(odd, ODD_DR[codes], EVEN_DR[codes]))])
+    return [MovementCostGraphBuilder.to_hex_id(c, r, digits) for c, r in zip(cols.tolist(), rows.tolist())]
+
+
+class PathCorpusWriter:
+    """Append-only binary path corpus with an offsets index.
+
+    Paths become durable when ``commit`` records progress; reopening the
+    corpus drops anything written after the last commit, so an interrupted
+    run resumes from the next uncommitted shard.
+    """
+
+    def __init__(self, base_path, digits=2, metadata=None):
+        self.files = corpus_files(base_path)
+
+        if os.path.exists(self.files["progress"]):
+            with open(self.files["progress"]) as f:
+                self.progress = json.load(f)
+            with open(self.files["data"], "rb") as f:
+                f.seek(len(MAGIC))
+                self.digits = int(np.frombuffer(f.read(4), dtype="<u4")[0])
+            self.data = open(self.files["data"], "r+b")
+            self.data.truncate(self.progress["data_bytes"])
+            self.data.seek(0, os.SEEK_END)
+            self.index = open(self.files["index"], "r+b")
+            self.index.truncate(self.progress["paths"] * 8)
+            self.index.seek(0, os.SEEK_END)
+            self.count = self.progress["paths"]
+        else:
+            self.progress = {"shards_done": 0, "paths": 0, "data_bytes": HEADER_SIZE, **(metadata or {})}
+            self.digits = digits
+            self.data = open(self.files["data"], "wb")
+            self.data.write(MAGIC + np.uint32(digits).astype("<u4").tobytes())
+            self.index = open(self.files["index"], "wb")
+            self.count = 0
+            self.commit(0)
+        self.position = self.progress["data_bytes"]
+
+    @property
+    def shards_done(self):
+        return self.progress["shards_done"]
+
+    def write(self, path):
+        record = encode_path(path)
+        self.index.write(np.uint64(self.position).astype("<u8").tobytes())
+        self.data.write(record)
+        self.position += len(record)
+        self.count += 1
+
+    def commit(self, shards_done):
+        self.data.flush()
+        self.index.flush()
+        os.fsync(self.data.fileno())
+        os.fsync(self.index.fileno())
+        self.progress.update(shards_done=shards_done, paths=self.count, data_bytes=self.data.tell())
+        tmp_path = self.files["progress"] + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.progress, f, indent=2)
+        os.replace(tmp_path, self.files["progress"])
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PathCorpusReader:
+    """Memory-mapped reader: ``corpus[k]`` decodes path *k* in O(1)"""
+
+    def __init__(self, base_path):
+        self.files = corpus_files(base_path)
+        self.data = np.memmap(self.files["data"], dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{self.files['data']} is not a path corpus")
+        self.digits = int(self.data[len(MAGIC):HEADER_SIZE].view("<u4")[0])
+
+        count = os.path.getsize(self.files["index"]) // 8
+        if os.path.exists(self.files["progress"]):
+            with open(self.files["progress"]) as f:
+                count = min(count, json.load(f)["paths"])
+        self.offsets = np.memmap(self.files["index"], dtype="<u8", mode="r", shape=(count,)) if count else np.zeros(0, "<u8")
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def path_lengths(self):
+        """Hex count of every path, read from the record headers only"""
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        steps_at = np.asarray(self.offsets, dtype=np.int64) + RECORD_HEADER.fields["steps"][1]
+        steps = self.data[steps_at[:, None] + np.arange(4)].view("<u4")[:, 0]
+        return steps.astype(np.int64) + 1
+
+    def __getitem__(self, k):
+        if not -len(self) <= k < len(self):
+            raise IndexError(k)
+        return decode_path(self.data, int(self.offsets[k]), self.digits)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
@@ -1,66 +1,131 @@
-import json
+import multiprocessing
 import random
 from pathlib import Path
-from collections import deque
+from ai_commander.compact_mcg import load_mcg
+from ai_commander.components import ComponentIndex
+from ai_commander.mcg import MovementCostGraphBuilder, hex_id_digits
+from ai_commander.pathfinding import AStarPathfinder
+from ai_commander.tools.pair_sampler import PairSampler
+from ai_commander.tools.path_corpus import PathCorpusWriter
+
+SHARD_SIZE = 1024
+
+_worker_generator = None
+
+
+def _init_worker(graph_path, unit_type):
+    global _worker_generator
+    _worker_generator = PathGenerator(graph_path, unit_type)
+
+
+def _generate_shard(task):
+    shard_index, pairs, seed, noise = task
+    return _worker_generator.generate_shard(shard_index, pairs, seed, noise)
+
+
+def shard_rng(seed, shard_index):
+    """RNG of one shard; depends only on the seed and the shard, never on the worker"""
+    return random.Random(f"{seed}:{shard_index}")
+
 
 class PathGenerator:
     def __init__(self, graph_path: str, unit_type: str):
-        with open(graph_path) as f:
-            self.graph = json.load(f)[unit_type]
+        mcg = load_mcg(graph_path)
+        self.graph_path = graph_path
+        self.graph = mcg[unit_type]
         self.unit_type = unit_type
+        self.components = ComponentIndex(mcg, [unit_type])
+        self.pathfinder = AStarPathfinder(self.components.compact, unit_type, components=self.components)
+        self.id_digits = len(self.pathfinder.hex_ids[0]) // 2 if self.pathfinder.hex_ids else 2
+
+    def find_path(self, start, goal, noise=0.3, budget=None, rng=random):
+        """Cost-aware A* path; ``noise`` randomly inflates edge costs so paths are near-optimal, not identical"""
+        return self.pathfinder.find_path(start, goal, budget=budget, rng=rng, noise=noise)
 
-    def find_path(self, start, goal, noise=0.3):
-        """Non optimal path with random noise in decision making"""
-        visited = set()
-        queue = deque()
-        queue.append((start, [start]))
+    def find_paths(self, pairs, noise=0.3, budget=None, rng=random):
+        return self.pathfinder.find_paths(pairs, budget=budget, rng=rng, noise=noise)
 
-        while queue:
-            current, path = queue.popleft()
-            if current == goal:
-                return path
+    def generate_shard(self, shard_index, pairs, seed, noise=0.3):
+        return self.find_paths(pairs, noise=noise, rng=shard_rng(seed, shard_index))
 
-            neighbors = list(self.graph.get(current, {}).items())
-            if not neighbors:
-                continue
+    def iter_shards(self, pairs, workers=1, seed=None, noise=0.3, shard_size=SHARD_SIZE, start_shard=0):
+        """Yield ``(shard_index, paths)`` in shard order.
 
-            random.shuffle(neighbors)
-            if random.random() < noise:
-                neighbors = neighbors[:max(1, len(neighbors) // 2)]
+        Pairs are split into fixed-size shards, each searched with its own
+        seeded RNG, so for a given seed the paths are the same whatever the
+        number of workers. Workers load the graph themselves from
+        ``graph_path``; a compact ``mcg.bin`` is memory-mapped and shared.
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 63)
+        tasks = (
+            (shard_index, pairs[start:start + shard_size], seed, noise)
+            for shard_index, start in enumerate(range(0, len(pairs), shard_size))
+            if shard_index >= start_shard
+        )
 
-            for neighbor, _ in neighbors:
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append((neighbor, path + [neighbor]))
+        if workers <= 1:
+            for shard_index, shard_pairs, shard_seed, shard_noise in tasks:
+                yield shard_index, self.generate_shard(shard_index, shard_pairs, shard_seed, shard_noise)
+            return
 
-        return None
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(self.graph_path, self.unit_type)) as pool:
+            shard_index = start_shard
+            for paths in pool.imap(_generate_shard, tasks):
+                yield shard_index, paths
+                shard_index += 1
 
-    def generate_paths(self, pairs, output_py_file):
+    def generate_paths(self, pairs, output_py_file, workers=1, seed=None, noise=0.3, shard_size=SHARD_SIZE):
         collected_paths = []
 
-        for start, end in pairs:
-            path = self.find_path(start, end)
-            if path:
-                collected_paths.append(path)
+        shards = self.iter_shards(list(pairs), workers=workers, seed=seed, noise=noise, shard_size=shard_size)
+        for _, paths in shards:
+            collected_paths.extend(path for path in paths if path)
 
         with open(output_py_file, "a") as f:
             for path in collected_paths:
                 f.write(f"{path}\n")
             return collected_paths
 
+    def stream_paths(self, pairs, corpus_path, workers=1, seed=None, noise=0.3, shard_size=SHARD_SIZE):
+        """Write paths to a binary corpus as shards finish; rerunning resumes an interrupted run.
+
+        Returns the number of paths in the corpus.
+        """
+        pairs = list(pairs)
+        run = {"shard_size": shard_size, "pairs": len(pairs), "unit_type": self.unit_type}
+        if seed is not None:
+            run["seed"] = seed
+        metadata = {"seed": random.randrange(2 ** 63), **run}
+
+        with PathCorpusWriter(corpus_path, digits=self.id_digits, metadata=metadata) as writer:
+            for key, value in run.items():
+                if writer.progress.get(key) != value:
+                    raise ValueError(f"Corpus {corpus_path} was started with {key}={writer.progress.get(key)}")
+            shards = self.iter_shards(
+                pairs, workers=workers, seed=writer.progress["seed"], noise=noise,
+                shard_size=shard_size, start_shard=writer.shards_done,
+            )
+            for shard_index, paths in shards:
+                for path in paths:
+                    if path:
+                        writer.write(path)
+                writer.commit(shard_index + 1)
+            return writer.count
+
     def format_hex_id(self, col, row):
-        return f"{col:02}{row:02}"
+        """Hex id in the zero-padding of the loaded map"""
+        return MovementCostGraphBuilder.to_hex_id(col, row, self.id_digits)
 
     def generate_hex_ids(self, width=10, height=10):
-        return [self.format_hex_id(col, row) for col in range(1, width + 1) for row in range(1, height + 1)]
-
-    def generate_unique_pairs(self, count=10_000):
-        pairs = set()
-        elements = ["01","02","03","04","05","06","07","08","09","10"]
-        while len(pairs) < count:
-            start = random.choice(elements) + random.choice(elements)
-            end = random.choice(elements) + random.choice(elements)
-            if start != end:
-                pairs.add((start, end))
-        return list(pairs)
+        digits = hex_id_digits(width, height)
+        return [
+            MovementCostGraphBuilder.to_hex_id(col, row, digits) for col in range(1, width + 1) for row in range(1, height + 1)
+        ]
 
+    def generate_unique_pairs(self, count=10_000, seed=None, stratify=None, bins=None, distance_fields=None):
+        """Unique start/goal pairs over the hexes of the MCG, only within connected components"""
+        sampler = PairSampler(
+            self.pathfinder.mcg, self.unit_type, seed=seed, distance_fields=distance_fields, components=self.components
+        )
+        return sampler.sample(count, stratify=stratify, bins=bins)
@@ -0,0 +1,64 @@
+import json
+import multiprocessing
+from collections import Counter
+from functools import partial
+
+from ai_commander.tokenizer import Wb95Tokenizer
+from ai_commander.tools.corpus_encoder import CHUNK_LINES, iter_chunks
+
+SPECIAL_TOKENS = ("<PAD>", "<UNK>")
+
+
+def count_chunk(commands, factorized=False):
+    """Token counts of one chunk; each distinct command is tokenized once"""
+    tokenizer = Wb95Tokenizer(factorized=factorized)
+    counts = Counter()
+    for command, repeats in Counter(commands).items():
+        for token in tokenizer.tokenize(command):
+            counts[token] += repeats
+    return counts
+
+
+def count_tokens(input_paths, workers=1, chunk_lines=CHUNK_LINES, factorized=False):
+    """Stream command files and merge per-chunk token counts, in ``workers`` processes"""
+    chunks = iter_chunks(input_paths, chunk_lines)
+    counts = Counter()
+    if workers <= 1:
+        for chunk in chunks:
+            counts.update(count_chunk(chunk, factorized))
+        return counts
+
+    with multiprocessing.Pool(workers) as pool:
+        for chunk_counts in pool.imap_unordered(partial(count_chunk, factorized=factorized), chunks):
+            counts.update(chunk_counts)
+    return counts
+
+
+def build_vocab(counts, min_count=1, max_size=None, special_tokens=SPECIAL_TOKENS):
+    """Frequency-ordered vocab: special tokens first, then the most frequent tokens.
+
+    Tokens seen fewer than ``min_count`` times are left out (they become
+    ``<UNK>``); ``max_size`` caps the vocab including the special tokens.
+    Ties are broken by token, so the same counts always give the same ids.
+    """
+    vocab = {token: i for i, token in enumerate(special_tokens)}
+    ranked = sorted(
+        (item for item in counts.items() if item[1] >= min_count and item[0] not in vocab),
+        key=lambda item: (-item[1], item[0]),
+    )
+    if max_size is not None:
+        ranked = ranked[:max(max_size - len(vocab), 0)]
+    for token, _ in ranked:
+        vocab[token] = len(vocab)
+    return vocab
+
+
+def build_vocab_file(input_paths, output_path, min_count=1, max_size=None, workers=1, chunk_lines=CHUNK_LINES,
+                     factorized=False):
+    """Count tokens of command files and write a ``vocab.json`` that ``Wb95Tokenizer`` loads"""
+    counts = count_tokens(input_paths, workers=workers, chunk_lines=chunk_lines, factorized=factorized)
+    vocab = build_vocab(counts, min_count=min_count, max_size=max_size)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(vocab, f, ensure_ascii=False, indent=4)
+    print(f"✅ Vocab saved to {output_path} with {len(vocab)} entries.")
+    return vocab
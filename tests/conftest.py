@@ -0,0 +1,11 @@
+import random
+
+import pytest
+
+from ai_commander.tools.map_generator import RandomMapGenerator
+
+
+@pytest.fixture
+def map_data(tmp_path):
+    random.seed(1995)
+    return RandomMapGenerator(width=10, height=10).generate(str(tmp_path))[1]
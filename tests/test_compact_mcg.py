@@ -0,0 +1,35 @@
+import json
+
+import numpy as np
+
+from ai_commander.compact_mcg import CompactMCG, load_mcg
+from ai_commander.mcg import MovementCostGraphBuilder
+
+
+def test_dict_view_matches_graph(map_data):
+    graph = MovementCostGraphBuilder(map_data).build_graph()
+    compact = CompactMCG.from_graph(graph)
+
+    assert set(compact) == set(graph)
+    for unit_type, unit_graph in graph.items():
+        view = compact[unit_type]
+        assert set(view) == set(unit_graph)
+        for hex_id, neighbors in unit_graph.items():
+            assert list(view[hex_id]) == list(neighbors)
+            for neighbor_id, cost in neighbors.items():
+                assert view[hex_id][neighbor_id] == np.float32(cost)
+    assert compact.get("INF").get("9999", {}) == {}
+
+
+def test_save_and_memory_mapped_load(map_data, tmp_path):
+    builder = MovementCostGraphBuilder(map_data)
+    compact = builder.save_compact(str(tmp_path))
+
+    loaded = load_mcg(str(tmp_path / "mcg.bin"))
+    assert isinstance(loaded["INF"].costs, np.memmap)
+    assert not loaded["INF"].costs.flags.writeable
+    assert loaded.hex_ids == list(map_data["hexes"])
+    assert loaded.to_dict() == compact.to_dict()
+
+    builder.save_graph(str(tmp_path))
+    assert load_mcg(str(tmp_path / "mcg.json")) == json.loads((tmp_path / "mcg.json").read_text())
@@ -0,0 +1,58 @@
+import copy
+import random
+
+import numpy as np
+import pytest
+
+from ai_commander.compact_mcg import as_compact
+from ai_commander.components import ComponentIndex
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.pathfinding import AStarPathfinder
+
+
+@pytest.fixture
+def lake_map(map_data):
+    map_data = copy.deepcopy(map_data)
+    map_data["terrain"]["LAKE"] = {}
+    return map_data
+
+
+def reachable(graph, start):
+    seen, stack = {start}, [start]
+    while stack:
+        for n in graph.row(stack.pop())[0].tolist():
+            if n not in seen:
+                seen.add(n)
+                stack.append(n)
+    return seen
+
+
+def test_component_labels_match_search(lake_map):
+    lake_map["roads"] = {}
+    builder = MovementCostGraphBuilder(lake_map)
+    compact = builder.build_compact()
+    builder.apply_changes(compact, hex_terrain={f"05{row:02}": "LAKE" for row in range(1, 11)})
+    components = ComponentIndex(compact)
+    finder = AStarPathfinder(compact, "INF", components=components)
+
+    assert not components.connected("INF", "0101", "1010")
+    assert finder.find_path("0101", "1010") is None
+    labels = components.labels["INF"]
+    for start in range(0, compact.num_hexes, 9):
+        assert set(np.flatnonzero(labels == labels[start])) == reachable(compact.unit("INF"), start)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_component_index_follows_edits(lake_map, compact):
+    builder = MovementCostGraphBuilder(lake_map)
+    graph = builder.build_compact() if compact else builder.build_graph()
+    components = ComponentIndex(graph)
+    rng = random.Random(11)
+    for _ in range(6):
+        hexes = rng.sample(sorted(builder.hex_terrain), 12)
+        terrain = {hex_id: rng.choice(["LAKE", "LAKE", "CLEAR"]) for hex_id in hexes}
+        builder.apply_changes(graph, hex_terrain=terrain, caches=[components])
+
+        fresh = ComponentIndex(as_compact(graph, components.hex_ids))
+        for unit_type in fresh.labels:
+            assert np.array_equal(components.labels[unit_type], fresh.labels[unit_type])
@@ -0,0 +1,42 @@
+import json
+import random
+
+from ai_commander.tokenizer import Wb95Tokenizer
+from ai_commander.tools.corpus_encoder import TokenCorpusReader, encode_corpus
+
+
+def write_commands(path, count, rng):
+    units = [f"{rng.randint(1, 3)}_{rng.randint(1, 3)}_{rng.randint(1, 20)}/2/2/{rng.randint(1, 4)}" for _ in range(8)]
+    actions = ["MOVE", "ATTACK", "DIGIN", "SUPPORT"]
+    commands = [
+        f"<{rng.choice(units)}><{rng.randint(1000, 1020)}><{rng.choice(actions)}><{rng.choice(units)}><{rng.randint(1000, 1020)}>"
+        for _ in range(count)
+    ]
+    commands.insert(7, "<9_9_9/1/1/1><MOVE>")
+    with open(path, "w", encoding="utf-8") as f:
+        for command in commands:
+            f.write(f"{command}\n\n")
+    return commands
+
+
+def test_encoded_corpus_matches_tokenizer(tmp_path):
+    rng = random.Random(4)
+    commands = write_commands(tmp_path / "a.txt", 300, rng) + write_commands(tmp_path / "b.txt", 200, rng)
+    tokens = sorted({token for command in commands[:100] for token in Wb95Tokenizer().tokenize(command)})
+    vocab = {"<PAD>": 0, "<UNK>": 1, **{token: i for i, token in enumerate(tokens, start=2)}}
+    vocab_path = tmp_path / "vocab.json"
+    vocab_path.write_text(json.dumps(vocab))
+    tokenizer = Wb95Tokenizer(str(vocab_path))
+    expected = [tokenizer(command)["input_ids"] for command in commands]
+
+    for workers in (1, 2):
+        base = str(tmp_path / f"corpus-{workers}")
+        count = encode_corpus(
+            [tmp_path / "a.txt", tmp_path / "b.txt"], base, str(vocab_path),
+            workers=workers, chunk_lines=64, shard_tokens=1000, cache_size=32,
+        )
+        corpus = TokenCorpusReader(base)
+        assert count == len(corpus) == len(commands)
+        assert len(corpus.shards) > 1
+        assert [ids.tolist() for ids in corpus] == expected
+        assert corpus[-1].tolist() == expected[-1]
@@ -0,0 +1,70 @@
+import math
+import random
+
+import pytest
+import torch
+
+from ai_commander.decoder import BeamSearchDecoder
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+from ai_commander.reachability import MP_EPSILON
+
+
+def reference_beam_search(model, mcg, path, goal, unit_type, mp, beam_width, max_steps):
+    """One query at a time with ``forward`` and Python lists"""
+    beams = [(0.0, list(path), 0.0, path[-1] == goal)]
+    for _ in range(max_steps):
+        if all(done for _, _, _, done in beams):
+            break
+        expanded = []
+        for score, route, spent, done in beams:
+            if done:
+                expanded.append((score, route, spent, done))
+                continue
+            result = model(route, goal, mcg, unit_type)
+            if result is None:
+                continue
+            for hex_id, prob in zip(result[0], result[1].tolist()):
+                cost = mcg[unit_type][route[-1]][hex_id]
+                if hex_id in route or spent + cost > mp + MP_EPSILON:
+                    continue
+                expanded.append((score + math.log(prob), route + [hex_id], spent + cost, hex_id == goal))
+        beams = sorted(expanded, key=lambda beam: -beam[0])[:beam_width]
+        finished = [beam for beam in beams if beam[3]]
+        if finished and finished[0][0] >= max((b[0] for b in beams if not b[3]), default=-math.inf):
+            beams = finished
+    finished = [beam for beam in beams if beam[3]]
+    if not finished:
+        return None
+    score, route, spent, _ = max(finished, key=lambda beam: beam[0])
+    return route[len(path):], score, spent
+
+
+@pytest.mark.parametrize("beam_width,mp", [(1, math.inf), (3, math.inf), (4, 6.0)])
+def test_batched_beam_search_matches_reference(map_data, beam_width, mp):
+    torch.manual_seed(0)
+    mcg = MovementCostGraphBuilder(map_data).build_graph()
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(mcg)
+    rng = random.Random(2)
+    hex_ids = sorted(mcg["INF"])
+    requests = []
+    for _ in range(25):
+        path = [rng.choice(hex_ids)]
+        if rng.random() < 0.5:
+            path.append(rng.choice(sorted(mcg["INF"][path[-1]])))
+        requests.append((path, rng.choice(hex_ids), "INF", mp))
+    requests.append((["0101"], "0101", "INF", mp))
+
+    decoder = BeamSearchDecoder(model, mcg, beam_width=beam_width, max_steps=15)
+    routes = decoder.decode(requests)
+    assert routes[-1] == ([], 0.0, 0.0)
+    assert any(route is not None and route[0] for route in routes)
+    with torch.no_grad():
+        for request, got in zip(requests, routes):
+            want = reference_beam_search(model, mcg, *request, beam_width=beam_width, max_steps=15)
+            assert (got is None) == (want is None)
+            if want is not None:
+                assert got[0] == want[0]
+                assert got[1] == pytest.approx(want[1], abs=1e-4)
+                assert got[2] == pytest.approx(want[2]) and got[2] <= mp + MP_EPSILON
+                assert len(set(request[0] + got[0])) == len(request[0]) + len(got[0])
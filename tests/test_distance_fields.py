@@ -0,0 +1,105 @@
+import copy
+import heapq
+import os
+
+import numpy as np
+import pytest
+
+from ai_commander.distance_fields import DistanceFields
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.pathfinding import AStarPathfinder
+
+
+def assert_optimal(fields, mcg, unit_type):
+    finder = AStarPathfinder(mcg, unit_type)
+    for start in fields.hex_ids[::7]:
+        for goal in fields.hex_ids[::5]:
+            path = finder.find_path(start, goal)
+            if path is None:
+                assert fields.distance(unit_type, start, goal) == np.inf
+                assert fields.path(unit_type, start, goal) is None
+                continue
+            expected = finder.path_cost(path)
+            assert fields.distance(unit_type, start, goal) == pytest.approx(expected, rel=1e-5)
+            route = fields.path(unit_type, start, goal)
+            assert route[0] == start and route[-1] == goal
+            assert finder.path_cost(route) == pytest.approx(expected, rel=1e-5)
+
+
+def test_distance_fields_match_astar(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    fields = DistanceFields.build(mcg)
+    for unit_type in mcg:
+        assert fields.distances[unit_type].dtype == np.float32
+        assert_optimal(fields, mcg, unit_type)
+
+
+def test_load_or_build_reuses_cache_until_hash_changes(map_data, tmp_path, capsys):
+    builder = MovementCostGraphBuilder(copy.deepcopy(map_data))
+    builder.save_graph(str(tmp_path))
+    graph_path = str(tmp_path / "mcg.json")
+
+    first = DistanceFields.load_or_build(graph_path)
+    assert os.path.exists(tmp_path / "distances_INF.npy")
+    second = DistanceFields.load_or_build(graph_path)
+    assert "already exist" in capsys.readouterr().out
+    assert isinstance(second.distances["INF"], np.memmap)
+    np.testing.assert_array_equal(second.next_hops["INF"], first.next_hops["INF"])
+
+    builder.hex_terrain["0505"] = "CLEAR" if builder.hex_terrain["0505"] == "FOREST" else "FOREST"
+    builder.save_graph(str(tmp_path))
+    third = DistanceFields.load_or_build(graph_path)
+    assert third.content_hash != first.content_hash
+
+
+def test_invalidate_edges_patches_fields(map_data):
+    builder = MovementCostGraphBuilder(copy.deepcopy(map_data))
+    mcg = builder.build_compact()
+    fields = DistanceFields.build(mcg)
+
+    road_id = next(iter(builder.roads))
+    builder.apply_changes(
+        mcg,
+        hex_terrain={"0404": "FOREST", "0405": "CLEAR"},
+        roads_removed=[road_id],
+        roads_added={"road-new": {"type": "ROAD", "hexes": ["0202", "0302", "0402"]}},
+        rivers_added={"river-new": {"type": "STREAM", "segments": ["0606-0607", "0606-0706"]}},
+        caches=[fields],
+    )
+
+    rebuilt = DistanceFields.build(mcg)
+    for unit_type in mcg:
+        np.testing.assert_allclose(fields.distances[unit_type], rebuilt.distances[unit_type], rtol=1e-5)
+        assert_optimal(fields, mcg, unit_type)
+    assert fields.content_hash == mcg.content_hash()
+
+
+def dijkstra_costs(graph, start):
+    costs = {start: 0.0}
+    queue = [(0.0, start)]
+    while queue:
+        cost, hex_id = heapq.heappop(queue)
+        if cost > costs[hex_id]:
+            continue
+        for neighbor, step in graph[hex_id].items():
+            if cost + step < costs.get(neighbor, np.inf):
+                costs[neighbor] = cost + step
+                heapq.heappush(queue, (cost + step, neighbor))
+    return costs
+
+
+def test_zero_cost_edges_match_dijkstra(map_data):
+    graph = MovementCostGraphBuilder(map_data).build_graph()
+    unit_graph = graph["INF"]
+    # Droga za darmo w obie strony plus jedna krawędź w głąb mapy
+    first = sorted(unit_graph)[0]
+    second = sorted(unit_graph[first])[0]
+    unit_graph[first][second] = 0.0
+    unit_graph[second][first] = 0.0
+    unit_graph[second][sorted(unit_graph[second])[-1]] = 0.0
+
+    fields = DistanceFields.build(graph, unit_types=["INF"])
+    for start in fields.hex_ids:
+        expected = dijkstra_costs(unit_graph, start) if start in unit_graph else {start: 0.0}
+        for goal in fields.hex_ids:
+            assert fields.distance("INF", start, goal) == pytest.approx(expected.get(goal, np.inf), rel=1e-5)
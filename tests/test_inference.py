@@ -0,0 +1,159 @@
+import asyncio
+import json
+import random
+import threading
+
+import pytest
+import torch
+
+from ai_commander.inference import InferenceService, LocalClient, MoveSuggester, TcpClient, serve_tcp
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+
+
+@pytest.fixture
+def setup(map_data):
+    torch.manual_seed(0)
+    mcg = MovementCostGraphBuilder(map_data).build_graph()
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(mcg)
+    rng = random.Random(3)
+    hex_ids = sorted(mcg["INF"])
+    requests = []
+    for _ in range(40):
+        path = [rng.choice(hex_ids)]
+        for _ in range(rng.randint(0, 5)):
+            path.append(rng.choice(sorted(mcg["INF"][path[-1]])))
+        requests.append((path, rng.choice(hex_ids), "INF"))
+    return model, mcg, requests
+
+
+def expected_moves(model, mcg, path, goal, unit_type):
+    result = model(path, goal, mcg, unit_type)
+    if result is None:
+        return None
+    return sorted(zip(result[0], result[1].tolist()), key=lambda move: -move[1])
+
+
+def assert_same_moves(got, want):
+    assert (got is None) == (want is None)
+    if want is not None:
+        assert [hex_id for hex_id, _ in got] == [hex_id for hex_id, _ in want]
+        assert [p for _, p in got] == pytest.approx([p for _, p in want], abs=1e-6)
+
+
+def test_service_batches_requests_and_matches_forward(setup):
+    model, mcg, requests = setup
+
+    async def run():
+        async with InferenceService(MoveSuggester(model, mcg), max_batch_size=16, max_delay=0.01) as service:
+            results = await LocalClient(service).suggest_many(requests)
+            with pytest.raises(ValueError):
+                await service.suggest(["0101"], "0202", "TANK")
+            return results, service.stats.report()
+
+    results, report = asyncio.run(run())
+    for (path, goal, unit_type), got in zip(requests, results):
+        assert_same_moves(got, expected_moves(model, mcg, path, goal, unit_type))
+    assert report["requests"] == len(requests)
+    assert report["batches"] <= 4 and report["mean_batch"] >= 10
+    assert report["p99_ms"] >= report["p50_ms"] > 0
+
+
+
+class SlowSuggester(MoveSuggester):
+    def __init__(self, model, mcg):
+        super().__init__(model, mcg)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def suggest_batch(self, requests):
+        self.entered.set()
+        self.release.wait(5)
+        return super().suggest_batch(requests)
+
+
+def test_stop_fails_queued_and_in_flight_requests(setup):
+    model, mcg, requests = setup
+    suggester = SlowSuggester(model, mcg)
+
+    async def run():
+        service = await InferenceService(suggester, max_batch_size=1, max_delay=0).start()
+        in_flight = asyncio.create_task(service.suggest(*requests[0]))
+        await asyncio.get_running_loop().run_in_executor(None, suggester.entered.wait, 5)
+        queued = asyncio.create_task(service.suggest(*requests[1]))
+        await asyncio.sleep(0.01)
+        await service.stop()
+        suggester.release.set()
+        outcomes = await asyncio.wait_for(asyncio.gather(in_flight, queued, return_exceptions=True), 1)
+        with pytest.raises(RuntimeError, match="not running"):
+            await service.suggest(*requests[2])
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+
+
+def test_suggest_before_start_raises(setup):
+    model, mcg, requests = setup
+    service = InferenceService(MoveSuggester(model, mcg))
+    with pytest.raises(RuntimeError, match="not running"):
+        asyncio.run(asyncio.wait_for(service.suggest(*requests[0]), 1))
+
+
+def test_tcp_stand_in_round_trip(setup):
+    model, mcg, requests = setup
+
+    async def run():
+        async with InferenceService(MoveSuggester(model, mcg), max_delay=0.01) as service:
+            server = await serve_tcp(service)
+            client = await TcpClient(*server.sockets[0].getsockname()[:2]).connect()
+            results = await asyncio.gather(*(client.suggest(*request) for request in requests[:10]))
+            with pytest.raises(RuntimeError, match="KeyError"):
+                await client.suggest(["9999"], "0101", "INF")
+            await client.close()
+            server.close()
+            await server.wait_closed()
+            return results, service.stats.batches
+
+    results, batches = asyncio.run(run())
+    for (path, goal, unit_type), got in zip(requests, results):
+        assert_same_moves(got, expected_moves(model, mcg, path, goal, unit_type))
+    assert batches < 10
+
+
+def test_tcp_errors_are_answered_not_hung(setup):
+    model, mcg, _ = setup
+
+    async def run():
+        async with InferenceService(MoveSuggester(model, mcg), max_delay=0.001) as service:
+            server = await serve_tcp(service)
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(b"not json\n[1, 2]\n")
+            replies = [json.loads(await asyncio.wait_for(reader.readline(), 5)) for _ in range(2)]
+            writer.close()
+            await writer.wait_closed()
+            server.close()
+            await server.wait_closed()
+            return replies
+
+    replies = asyncio.run(run())
+    assert all(reply["id"] is None and "error" in reply for reply in replies)
+
+
+def test_tcp_client_fails_pending_requests_on_eof():
+    async def run():
+        async def silent(reader, writer):
+            await reader.readline()
+            writer.close()
+
+        server = await asyncio.start_server(silent, "127.0.0.1", 0)
+        client = await TcpClient(*server.sockets[0].getsockname()[:2]).connect()
+        with pytest.raises(ConnectionError):
+            await asyncio.wait_for(client.suggest(["0101"], "0202", "INF"), 5)
+        with pytest.raises(ConnectionError):
+            await client.suggest(["0101"], "0202", "INF")
+        await client.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+import copy
+
+from ai_commander.compact_mcg import CompactMCG
+from ai_commander.mcg import MovementCostGraphBuilder
+
+
+class RecordingCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate_edges(self, changed):
+        self.invalidated.append(changed)
+
+
+def edit(builder, graph, cache):
+    road_id, road = next(iter(builder.roads.items()))
+    river_id = next(iter(builder.rivers))
+    return builder.apply_changes(
+        graph,
+        hex_terrain={"0505": "FOREST", "0506": "CLEAR", "0101": "FOREST"},
+        roads_added={"road-new": {"type": "ROAD", "hexes": ["0707", "0708", "0808"]}},
+        roads_removed=[road_id],
+        rivers_added={"river-new": {"type": "STREAM", "segments": ["0303-0304", "0707-0708"]}},
+        rivers_removed=[river_id],
+        caches=[cache],
+    )
+
+
+def test_apply_changes_matches_full_rebuild(map_data):
+    builder = MovementCostGraphBuilder(copy.deepcopy(map_data))
+    graph = builder.build_graph()
+    before = copy.deepcopy(graph)
+    cache = RecordingCache()
+
+    changed = edit(builder, graph, cache)
+
+    rebuilt = MovementCostGraphBuilder(builder.map_data).build_graph()
+    assert graph == rebuilt
+    assert cache.invalidated == [changed]
+    assert changed == {
+        (unit, h1, h2)
+        for unit in rebuilt
+        for h1 in before[unit].keys() | rebuilt[unit].keys()
+        for h2 in before[unit].get(h1, {}).keys() | rebuilt[unit].get(h1, {}).keys()
+        if before[unit].get(h1, {}).get(h2) != rebuilt[unit].get(h1, {}).get(h2)
+    }
+    assert builder.apply_changes(graph, hex_terrain={"0505": "FOREST"}) == set()
+
+
+def test_apply_changes_patches_compact_graph(map_data):
+    builder = MovementCostGraphBuilder(copy.deepcopy(map_data))
+    compact = builder.build_compact()
+    changed = edit(builder, compact, RecordingCache())
+
+    rebuilt = MovementCostGraphBuilder(builder.map_data).build_graph()
+    assert changed
+    assert compact.to_dict() == CompactMCG.from_graph(rebuilt, compact.hex_ids).to_dict()
@@ -0,0 +1,152 @@
+import random
+import subprocess
+import sys
+
+import pytest
+import torch
+from torch.nn import CrossEntropyLoss
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+from ai_commander.pathfinding import AStarPathfinder
+from ai_commander.PlayerPathDataset import PlayerPathDataset, collate_paths
+
+
+def make_dataset(map_data, count=40):
+    mcg = MovementCostGraphBuilder(map_data).build_graph()
+    finder = AStarPathfinder(mcg, "INF")
+    rng = random.Random(3)
+    hex_ids = sorted(map_data["hexes"])
+    paths = [finder.find_path(rng.choice(hex_ids), rng.choice(hex_ids), rng=rng, noise=0.3) for _ in range(count)]
+    return PlayerPathDataset([path for path in paths if path], mcg, unit_type="INF")
+
+
+def test_forward_batch_matches_single_samples(map_data):
+    torch.manual_seed(0)
+    dataset = make_dataset(map_data)
+    model = ManueverabilityFirstLayerMapTensor()
+    neighbors, neighbor_mask = model.neighbor_table(dataset.mcg, "INF")
+    batch = collate_paths([dataset[i] for i in range(len(dataset))])
+    context, lengths, target, true_idx = model.prepare_batch(batch, model.dataset_rows(dataset), neighbors, neighbor_mask)
+    assert len(context) == len(dataset)
+
+    candidates, probs = model.forward_batch(context, lengths, target, neighbors, neighbor_mask)
+    loss_fn = CrossEntropyLoss()
+    expected_loss = 0
+    for i in range(len(dataset)):
+        path, true_next, goal = dataset.hex_sample(i)
+        candidate_ids, single = model(path, goal, dataset.mcg, "INF")
+        k = len(candidate_ids)
+        assert candidates[i, :k].tolist() == [int(h) for h in candidate_ids]
+        torch.testing.assert_close(probs[i, :k], single)
+        assert (probs[i, k:] == 0).all()
+        target_idx = torch.tensor([candidate_ids.index(true_next)])
+        assert target_idx.item() == true_idx[i].item()
+        expected_loss += loss_fn(single.unsqueeze(0), target_idx)
+
+    batch_loss = model.batch_loss(context, lengths, target, true_idx, neighbors, neighbor_mask)
+    torch.testing.assert_close(batch_loss, expected_loss)
+
+
+def test_train_mflmt_runs_batched(map_data, tmp_path):
+    torch.manual_seed(0)
+    dataset = make_dataset(map_data)
+    model = ManueverabilityFirstLayerMapTensor()
+    model.train_mflmt(dataset, epochs=2, batch_size=16, model_dir=str(tmp_path))
+    assert (tmp_path / "mflmt.pt").exists()
+
+
+def test_dense_hex_index_sparse_training_and_checkpoint(map_data, tmp_path):
+    torch.manual_seed(0)
+    dataset = make_dataset(map_data)
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(dataset.mcg, sparse=True)
+    assert model.hex_embed.num_embeddings == len(map_data["hexes"])
+
+    before = model.hex_embed.weight.detach().clone()
+    model.train_mflmt(dataset, epochs=1, batch_size=16, model_dir=str(tmp_path))
+    assert model.hex_embed.weight.grad is None or model.hex_embed.weight.grad.is_sparse
+    assert (model.hex_embed.weight.detach() != before).any()
+
+    loaded = ManueverabilityFirstLayerMapTensor.load_checkpoint(str(tmp_path / "mflmt.pt"), mcg=dataset.mcg)
+    assert loaded.hex_ids == model.hex_ids and loaded.sparse
+    path, _, goal = dataset.hex_sample(0)
+    _, expected = model(path, goal, dataset.mcg, "INF")
+    _, probs = loaded(path, goal, dataset.mcg, "INF")
+    torch.testing.assert_close(probs, expected)
+
+    other_map = {"INF": {"0101": {"0102": 1}, "0102": {"0101": 1}}}
+    with pytest.raises(ValueError):
+        ManueverabilityFirstLayerMapTensor.load_checkpoint(str(tmp_path / "mflmt.pt"), mcg=other_map)
+
+
+def test_train_mflmt_distributed_gloo(map_data, tmp_path):
+    torch.manual_seed(0)
+    dataset = make_dataset(map_data)
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(dataset.mcg)
+    before = model.hex_embed.weight.detach().clone()
+    model.train_mflmt(dataset, epochs=1, batch_size=8, model_dir=str(tmp_path), world_size=2)
+
+    saved = ManueverabilityFirstLayerMapTensor.load_checkpoint(str(tmp_path / "mflmt.pt"), mcg=dataset.mcg)
+    assert torch.equal(saved.hex_embed.weight, model.hex_embed.weight)
+    assert (model.hex_embed.weight.detach() != before).any()
+
+
+def test_incremental_rollout_matches_full_recompute(map_data):
+    torch.manual_seed(0)
+    dataset = make_dataset(map_data)
+    mcg = dataset.mcg
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(mcg)
+    neighbors, neighbor_mask = model.neighbor_table(mcg, "INF")
+    context, lengths, _, target = collate_paths([dataset[i] for i in range(8)])
+
+    state = model.start_rollout(context, lengths, target)
+    for _ in range(3):
+        candidates, probs = model.rollout_step(state, neighbors, neighbor_mask)
+        full_candidates, full_probs = model.forward_batch(context, lengths, target, neighbors, neighbor_mask)
+        assert torch.equal(candidates, full_candidates)
+        torch.testing.assert_close(probs, full_probs)
+        next_rows = candidates[:, 0]
+        state = model.advance(state, next_rows)
+        context = torch.cat([context, torch.zeros((len(context), 1), dtype=torch.long)], dim=1)
+        context[torch.arange(len(context)), lengths] = next_rows
+        lengths = lengths + 1
+
+    path, _, goal = dataset.hex_sample(0)
+    expected = []
+    with torch.no_grad():
+        while len(expected) < 20 and path[-1] != goal:
+            result = model(path, goal, mcg, "INF")
+            if result is None:
+                break
+            candidate_ids, probs = result
+            path = path + [candidate_ids[int(probs.argmax())]]
+            expected.append(path[-1])
+    assert model.rollout(dataset.hex_sample(0)[0], goal, mcg, "INF", max_steps=20) == expected
+
+
+def test_torchscript_export_loads_without_package(map_data, tmp_path):
+    torch.manual_seed(0)
+    dataset = make_dataset(map_data)
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(dataset.mcg)
+    neighbors, neighbor_mask = model.neighbor_table(dataset.mcg, "INF")
+    context, lengths, _, target = collate_paths([dataset[i] for i in range(6)])
+    model.save_torchscript(dataset.mcg, "INF", str(tmp_path / "mflmt.ts"))
+    torch.save((context, lengths, target), tmp_path / "inputs.pt")
+
+    script = (
+        "import sys; sys.modules['ai_commander'] = None\n"
+        "import torch\n"
+        f"model = torch.jit.load({str(tmp_path / 'mflmt.ts')!r})\n"
+        f"context, lengths, target = torch.load({str(tmp_path / 'inputs.pt')!r})\n"
+        f"torch.save(model(context, lengths, target), {str(tmp_path / 'outputs.pt')!r})\n"
+        "print(model.hex_id(model.hex_index(['0101', '0102']).tolist()))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "['0101', '0102']"
+
+    candidates, probs = torch.load(tmp_path / "outputs.pt")
+    with torch.no_grad():
+        want_candidates, want_probs = model.forward_batch(context, lengths, target, neighbors, neighbor_mask)
+    assert torch.equal(candidates, want_candidates)
+    torch.testing.assert_close(probs, want_probs)
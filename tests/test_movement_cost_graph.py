@@ -1,6 +1,58 @@
+import json
+
+from ai_commander.compact_mcg import CompactMCG
 from ai_commander.mcg import MovementCostGraphBuilder
 
+
+def edge_case_map():
+    hexes = {MovementCostGraphBuilder.to_hex_id(c, r): "CLEAR" for c in range(1, 5) for r in range(1, 5)}
+    hexes["0202"] = "SWAMP"
+    hexes["0303"] = "FOREST"
+    return {
+        "metadata": {"width": 4, "height": 4},
+        "terrain": {
+            "CLEAR": {"move_cost": {"INF": 1, "WHL": 2}},
+            "FOREST": {"move_cost": {"INF": 2, "WHL": 4.5}},
+            "SWAMP": {"move_cost": {"INF": 3}},
+            "ROAD": {"move_cost": {"INF": 0.5, "WHL": 0.333}},
+            "TRACK": {"move_cost": {"INF": 0.75}},
+        },
+        "hexes": hexes,
+        "roads": {
+            "road-1": {"type": "ROAD", "hexes": ["0101", "0202", "0302"]},
+            "road-2": {"type": "TRACK", "hexes": ["0202", "0101"]},
+            "road-3": {"type": "ROAD", "hexes": ["0302", "9999"]},
+        },
+        "rivers": {
+            "river-1": {"segments": ["0202-0302", "0303-0304", "0101-0102"]},
+        },
+    }
+
+
+def test_vectorized_build_matches_loop(map_data):
+    for data in (map_data, edge_case_map()):
+        builder = MovementCostGraphBuilder(data)
+        graph = builder.build_graph()
+        vectorized = builder.build_graph_vectorized()
+        assert vectorized == graph
+        assert json.dumps(vectorized, sort_keys=True) == json.dumps(graph, sort_keys=True)
+        assert builder.build_compact().to_dict() == CompactMCG.from_graph(graph, list(data["hexes"])).to_dict()
+
+
+def test_wide_maps_use_wider_hex_ids():
+    hexes = {MovementCostGraphBuilder.to_hex_id(c, r, 3): "CLEAR" for c in (99, 100, 101) for r in (1, 2)}
+    builder = MovementCostGraphBuilder({
+        "metadata": {"width": 120, "height": 2},
+        "terrain": {"CLEAR": {"move_cost": {"INF": 1}}},
+        "hexes": hexes,
+    })
+    graph = builder.build_graph()
+    assert MovementCostGraphBuilder.parse_hex_id("100002") == (100, 2)
+    assert set(graph["INF"]["100001"]) == {"101001", "100002", "099001", "101002", "099002"}
+    assert builder.build_graph_vectorized() == graph
+
+
 # === ENTRY POINT ===
 if __name__ == "__main__":
     builder = MovementCostGraphBuilder.from_file("tests/generated/clever_aisha/generated-map.json")
-    builder.save_graph("tests/generated/clever_aisha/movement-cost-graph.json")
\ No newline at end of file
+    builder.save_graph("tests/generated/clever_aisha/movement-cost-graph.json")
@@ -0,0 +1,94 @@
+import pytest
+
+from ai_commander.compact_mcg import CompactMCG
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.overlay import MovementOverlay
+from ai_commander.pathfinding import AStarPathfinder
+from ai_commander.reachability import ReachabilityEngine
+
+
+def overlaid_graph(mcg, overlay):
+    """The base graph with the overlay baked in, as a reference"""
+    graph = {}
+    for unit_type, unit_graph in mcg.to_dict().items():
+        graph[unit_type] = {
+            hex_id: {
+                n: overlay.entry_cost(c, mcg.hex_index[n])
+                for n, c in row.items()
+                if not overlay.blocked[mcg.hex_index[n]]
+            }
+            for hex_id, row in unit_graph.items()
+        }
+    return CompactMCG.from_graph(graph, mcg.hex_ids)
+
+
+def test_overlay_matches_baked_graph(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    overlay = MovementOverlay(mcg, zoc_penalty=2.0)
+    overlay.place("1/1/1", "0505")
+    overlay.place("2/1/1", "0507")
+    overlay.place("3/1/1", "0909")
+    overlay.move("3/1/1", "0303")
+    overlay.remove("2/1/1")
+
+    fresh = MovementOverlay(mcg, zoc_penalty=2.0)
+    fresh.place("1/1/1", "0505")
+    fresh.place("3/1/1", "0303")
+    assert overlay.blocked == fresh.blocked and overlay.penalty == fresh.penalty
+    assert overlay.blocked[mcg.hex_index["0505"]] and not overlay.blocked[mcg.hex_index["0507"]]
+
+    baked = overlaid_graph(mcg, overlay)
+    queries = [("INF", hex_id, 4) for hex_id in ("0101", "0406", "0606", "1010")]
+    with_overlay = ReachabilityEngine(mcg, overlay=overlay).reach_batch(queries)
+    reference = ReachabilityEngine(baked).reach_batch(queries)
+    for (indices, remaining), (ref_indices, ref_remaining) in zip(with_overlay, reference):
+        assert indices.tolist() == ref_indices.tolist()
+        assert remaining.tolist() == ref_remaining.tolist()
+
+    finder = AStarPathfinder(mcg, "INF", overlay=overlay)
+    path = finder.find_path("0405", "0605")
+    assert "0505" not in path
+    baked_finder = AStarPathfinder(baked, "INF")
+    assert finder.path_cost(path) == baked_finder.path_cost(path)
+    assert finder.path_cost(path) == baked_finder.path_cost(baked_finder.find_path("0405", "0605"))
+    assert finder.find_path("0101", "0505") is None
+
+
+def test_failed_move_leaves_overlay_unchanged(map_data):
+    overlay = MovementOverlay(MovementCostGraphBuilder(map_data).build_compact())
+    overlay.place("enemy-1", "0505")
+    before = (list(overlay.blocked), list(overlay.penalty), dict(overlay.units))
+
+    with pytest.raises(KeyError):
+        overlay.move("enemy-1", "9999")
+    assert (overlay.blocked, overlay.penalty, overlay.units) == before
+
+    overlay.move("enemy-1", "0707")
+    assert overlay.units == {"enemy-1": overlay.hex_index["0707"]}
+    assert not overlay.blocked[overlay.hex_index["0505"]] and overlay.blocked[overlay.hex_index["0707"]]
+
+
+def test_renumbered_graph_moves_attached_overlay(map_data):
+    map_data["terrain"]["LAKE"] = {}
+    map_data["roads"] = {}
+    map_data["rivers"] = {}
+    map_data["hexes"]["0303"] = "LAKE"
+    builder = MovementCostGraphBuilder(map_data)
+    graph = builder.build_graph()
+    overlay = MovementOverlay(graph)
+    overlay.place("enemy-1", "0505")
+    finder = AStarPathfinder(graph, "INF", overlay=overlay)
+    engine = ReachabilityEngine(graph, overlay=overlay)
+    assert "0303" not in finder.hex_index
+
+    # Jezioro znika: heks dostaje pierwsze krawędzie i numeracja się przesuwa
+    builder.apply_changes(graph, hex_terrain={"0303": "CLEAR"}, caches=[finder, engine])
+    assert overlay.hex_ids == finder.hex_ids == engine.hex_ids
+    assert "0303" in overlay.hex_index
+
+    fresh = MovementOverlay(finder.mcg)
+    fresh.place("enemy-1", "0505")
+    assert overlay.blocked == fresh.blocked and overlay.penalty == fresh.penalty
+    assert "0505" not in finder.find_path("0504", "0506")
+    reached = {engine.hex_ids[i] for i in engine.reach("INF", "0303", 3)[0]}
+    assert "0302" in reached and "0505" not in reached
@@ -0,0 +1,54 @@
+import numpy as np
+
+from ai_commander.distance_fields import DistanceFields
+from ai_commander.mcg import MovementCostGraphBuilder, hex_distance
+from ai_commander.pathfinding import AStarPathfinder
+from ai_commander.tools import pair_sampler
+from ai_commander.tools.pair_sampler import PairSampler
+
+
+def test_pairs_are_unique_and_reachable(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    sampler = PairSampler(mcg, "INF", seed=7)
+    pairs = sampler.sample(500)
+
+    assert len(pairs) == len(set(pairs)) == 500
+    assert all(start != goal for start, goal in pairs)
+    finder = AStarPathfinder(mcg, "INF")
+    assert all(finder.find_path(start, goal) is not None for start, goal in pairs[:50])
+    assert pairs == PairSampler(mcg, "INF", seed=7).sample(500)
+
+
+def test_dense_and_sparse_sampling_agree_on_validity(map_data, monkeypatch):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    sampler = PairSampler(mcg, "INF", seed=3)
+    everything = sampler.sample(sampler.total_pairs + 10)
+    assert len(set(everything)) == sampler.total_pairs
+
+    monkeypatch.setattr(pair_sampler, "DENSE_LIMIT", 0)
+    sparse = PairSampler(mcg, "INF", seed=3).sample(300)
+    assert len(set(sparse)) == 300
+    assert set(sparse) <= set(everything)
+
+
+def test_distance_stratification(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    sampler = PairSampler(mcg, "INF", seed=5)
+    pairs = sampler.sample(300, stratify="distance", bins=[1, 2, 5, np.inf])
+
+    coords = np.array([
+        [*MovementCostGraphBuilder.parse_hex_id(s), *MovementCostGraphBuilder.parse_hex_id(g)] for s, g in pairs
+    ])
+    distances = hex_distance(*coords.T)
+    counts = np.histogram(distances, bins=[1, 2, 5, 1000])[0]
+    assert counts.tolist() == [100, 100, 100]
+
+
+def test_cost_stratification_keeps_sub_one_cost_pairs(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    fields = DistanceFields.build(mcg)
+    pairs = PairSampler(mcg, "INF", seed=5, distance_fields=fields).sample(700, stratify="cost")
+
+    costs = np.array([fields.distance("INF", start, goal) for start, goal in pairs])
+    assert np.isfinite(costs).all()
+    assert 0 < np.count_nonzero(costs < 1) <= 100
@@ -0,0 +1,58 @@
+import os
+import random
+
+import pytest
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.tools.path_corpus import PathCorpusReader, PathCorpusWriter
+from ai_commander.tools.path_generator import PathGenerator
+
+
+@pytest.fixture
+def generator(map_data, tmp_path):
+    MovementCostGraphBuilder(map_data).save_compact(str(tmp_path))
+    return PathGenerator(str(tmp_path / "mcg.bin"), unit_type="INF")
+
+
+def sample_pairs(map_data, count=50):
+    rng = random.Random(5)
+    hex_ids = list(map_data["hexes"])
+    return [(rng.choice(hex_ids), rng.choice(hex_ids)) for _ in range(count)]
+
+
+def test_corpus_round_trip(generator, map_data, tmp_path):
+    paths = [p for p in generator.find_paths(sample_pairs(map_data), rng=random.Random(1)) if p]
+    with PathCorpusWriter(str(tmp_path / "paths")) as writer:
+        for path in paths:
+            writer.write(path)
+        writer.commit(1)
+
+    corpus = PathCorpusReader(str(tmp_path / "paths"))
+    assert len(corpus) == len(paths)
+    assert corpus[7] == paths[7]
+    assert corpus[-1] == paths[-1]
+    assert list(corpus) == paths
+    assert os.path.getsize(tmp_path / "paths.bin") < sum(len(repr(p)) for p in paths) / 4
+
+
+def test_stream_paths_resumes_without_duplicates(generator, map_data, tmp_path):
+    pairs = sample_pairs(map_data)
+    full = str(tmp_path / "full")
+    generator.stream_paths(pairs, full, seed=9, shard_size=8)
+
+    # Przerwany przebieg: shard 3 zapisany, ale niezatwierdzony
+    partial = str(tmp_path / "partial")
+    metadata = {"seed": 9, "shard_size": 8, "pairs": len(pairs), "unit_type": "INF"}
+    with PathCorpusWriter(partial, metadata=metadata) as writer:
+        for shard_index, paths in generator.iter_shards(pairs, seed=9, shard_size=8):
+            for path in filter(None, paths):
+                writer.write(path)
+            if shard_index == 2:
+                writer.commit(3)
+            if shard_index == 3:
+                break
+
+    assert generator.stream_paths(pairs, partial, shard_size=8) == len(PathCorpusReader(full))
+    assert list(PathCorpusReader(partial)) == list(PathCorpusReader(full))
+    with pytest.raises(ValueError):
+        generator.stream_paths(pairs, partial, seed=10, shard_size=8)
@@ -0,0 +1,110 @@
+import heapq
+import random
+
+import pytest
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.pathfinding import AStarPathfinder
+from ai_commander.tools.path_generator import PathGenerator
+
+
+def dijkstra_costs(graph, start):
+    dist = {start: 0.0}
+    heap = [(0.0, start)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        for neighbor, cost in graph.get(node, {}).items():
+            if d + cost < dist.get(neighbor, float("inf")):
+                dist[neighbor] = d + cost
+                heapq.heappush(heap, (d + cost, neighbor))
+    return dist
+
+
+def test_astar_finds_minimal_cost_paths(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    graph = mcg["ATV"].to_dict()
+    finder = AStarPathfinder(mcg, "ATV")
+    rng = random.Random(7)
+    pairs = [(rng.choice(mcg.hex_ids), rng.choice(mcg.hex_ids)) for _ in range(50)]
+
+    for (start, goal), path in zip(pairs, finder.find_paths(pairs)):
+        expected = dijkstra_costs(graph, start).get(goal)
+        if expected is None:
+            assert path is None
+            continue
+        assert path[0] == start and path[-1] == goal
+        assert finder.path_cost(path) == pytest.approx(expected, rel=1e-5)
+
+
+def test_budget_limits_path_cost(map_data):
+    finder = AStarPathfinder(MovementCostGraphBuilder(map_data).build_graph(), "INF")
+    path = finder.find_path("0101", "0808")
+    cost = finder.path_cost(path)
+    assert finder.find_path("0101", "0808", budget=cost) == path
+    assert finder.find_path("0101", "0808", budget=cost - 0.01) is None
+
+
+def test_path_generator_noisy_paths_follow_edges(map_data, tmp_path):
+    MovementCostGraphBuilder(map_data).save_compact(str(tmp_path))
+    generator = PathGenerator(str(tmp_path / "mcg.bin"), unit_type="INF")
+    random.seed(3)
+    for path in generator.find_paths([("0101", "1010"), ("0210", "0901")], noise=0.5):
+        assert all(b in generator.graph[a] for a, b in zip(path, path[1:]))
+
+
+def test_generated_paths_do_not_depend_on_worker_count(map_data, tmp_path):
+    MovementCostGraphBuilder(map_data).save_compact(str(tmp_path))
+    generator = PathGenerator(str(tmp_path / "mcg.bin"), unit_type="INF")
+    rng = random.Random(11)
+    hex_ids = list(map_data["hexes"])
+    pairs = [(rng.choice(hex_ids), rng.choice(hex_ids)) for _ in range(60)]
+
+    def generate(workers, seed):
+        return [
+            path for _, paths in generator.iter_shards(pairs, workers=workers, seed=seed, shard_size=16)
+            for path in paths
+        ]
+
+    single = generate(1, 42)
+    assert generate(3, 42) == single
+    assert generate(1, 43) != single
+    paths = generator.generate_paths(pairs, str(tmp_path / "paths.txt"), workers=2, seed=42, shard_size=16)
+    assert paths == [path for path in single if path]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_finder_in_caches_follows_apply_changes(map_data, compact):
+    map_data["terrain"]["SWAMP"] = {"move_cost": {"INF": 5, "ATV": 8}}
+    map_data["terrain"]["LAKE"] = {}
+    map_data["roads"] = {}
+    builder = MovementCostGraphBuilder(map_data)
+    mcg = builder.build_compact() if compact else builder.build_graph()
+    finder = AStarPathfinder(mcg, "INF")
+    route = finder.find_path("0105", "1005")
+
+    changed = builder.apply_changes(mcg, hex_terrain={h: "SWAMP" for h in route[1:-1]}, caches=[finder])
+    assert changed
+    graph = mcg["INF"].to_dict() if compact else mcg["INF"]
+    path = finder.find_path("0105", "1005")
+    assert finder.path_cost(path) == pytest.approx(dijkstra_costs(graph, "0105")["1005"], rel=1e-5)
+    assert finder.path_cost(path) == pytest.approx(finder.path_cost(AStarPathfinder(mcg, "INF").find_path("0105", "1005")))
+
+    builder.apply_changes(mcg, hex_terrain={f"05{row:02}": "LAKE" for row in range(1, 11)}, caches=[finder])
+    assert finder.find_path("0105", "1005") is None
+
+
+def test_generator_hex_ids_follow_map_padding(tmp_path):
+    map_data = {
+        "metadata": {"width": 120, "height": 3},
+        "terrain": {"CLEAR": {"move_cost": {"INF": 1}}},
+        "hexes": {MovementCostGraphBuilder.to_hex_id(c, r, 3): "CLEAR" for c in range(1, 121) for r in range(1, 4)},
+        "roads": {},
+        "rivers": {},
+    }
+    MovementCostGraphBuilder(map_data).save_compact(str(tmp_path))
+    generator = PathGenerator(str(tmp_path / "mcg.bin"), unit_type="INF")
+
+    assert generator.format_hex_id(105, 2) == "105002"
+    assert set(generator.generate_hex_ids(120, 3)) == set(map_data["hexes"])
@@ -46,7 +46,7 @@ if __name__ == "__main__":
     paths = path_generator.generate_paths(sample_pairs, paths_file)
 
     # Model
-    mflmt = ManueverabilityFirstLayerMapTensor()
+    mflmt = ManueverabilityFirstLayerMapTensor.from_mcg(mcg)
     dataset = PlayerPathDataset(paths, mcg, unit_type="INF")
 
     # Train
@@ -0,0 +1,112 @@
+import random
+
+import numpy as np
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.PlayerPathDataset import (
+    LengthBucketSampler, MapGroupedBatchSampler, MultiMapPathDataset, PlayerPathDataset, collate_map_batch,
+    collate_paths,
+)
+from ai_commander.tools.map_generator import RandomMapGenerator
+from ai_commander.tools.path_corpus import PathCorpusWriter
+
+
+def random_paths(mcg, count, rng):
+    graph = mcg["INF"]
+    hex_ids = sorted(graph)
+    paths = []
+    for _ in range(count):
+        path = [rng.choice(hex_ids)]
+        for _ in range(rng.randint(0, 12)):
+            path.append(rng.choice(sorted(graph[path[-1]])))
+        paths.append(path)
+    return paths
+
+
+def test_samples_match_prefix_expansion(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_graph()
+    paths = random_paths(mcg, 60, random.Random(5))
+    dataset = PlayerPathDataset(paths, mcg, unit_type="INF")
+
+    expected = [(path[:i], path[i], path[-1]) for path in paths if len(path) >= 4 for i in range(2, len(path) - 1)]
+    assert [dataset.hex_sample(i) for i in range(len(dataset))] == expected
+    assert dataset.hexes.dtype == np.int32 and len(dataset.hexes) == sum(map(len, paths))
+
+    context, lengths, masked, target = collate_paths([dataset[i] for i in (0, 5, 9)])
+    assert context.shape == (3, int(lengths.max()))
+    for row, i in enumerate((0, 5, 9)):
+        path, hex_masked, hex_target = dataset[i]
+        assert context[row, :lengths[row]].tolist() == path.tolist()
+        assert (context[row, lengths[row]:] == 0).all()
+        assert (masked[row].item(), target[row].item()) == (hex_masked, hex_target)
+
+
+def test_length_bucket_sampler_covers_every_sample_once():
+    lengths = np.random.default_rng(0).integers(2, 40, size=1000)
+    sampler = LengthBucketSampler(lengths, batch_size=32, bucket_batches=8, seed=1)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert sorted(i for batch in batches for i in batch) == list(range(1000))
+    spread = np.mean([lengths[batch].max() - lengths[batch].min() for batch in batches])
+    assert spread < 10
+
+
+def generated_maps(root, count):
+    """``count`` map directories like ``tests/generated/<run_id>/`` with an MCG and a path corpus"""
+    maps = []
+    for seed in range(count):
+        map_dir = root / f"run_{seed}"
+        map_dir.mkdir()
+        random.seed(seed)
+        map_data = RandomMapGenerator(width=6 + seed, height=6).generate(str(map_dir))[1]
+        builder = MovementCostGraphBuilder(map_data)
+        mcg = builder.build_graph()
+        builder.save_compact(str(map_dir))
+        paths = random_paths(mcg, 20, random.Random(seed))
+        with PathCorpusWriter(str(map_dir / "paths")) as writer:
+            for path in paths:
+                writer.write(path)
+            writer.commit(1)
+        maps.append((map_dir, PlayerPathDataset(paths, mcg)))
+    return maps
+
+
+def test_multi_map_dataset_matches_single_map_datasets(tmp_path):
+    maps = generated_maps(tmp_path, 4)
+    dataset = MultiMapPathDataset([map_dir for map_dir, _ in maps], cache_size=2)
+    assert len(dataset) == sum(len(single) for _, single in maps)
+
+    expected = [(map_id, i) for map_id, (_, single) in enumerate(maps) for i in range(len(single))]
+    for idx in range(0, len(dataset), 7):
+        map_id, i = expected[idx]
+        got_map, context, masked, target = dataset[idx]
+        want_context, want_masked, want_target = maps[map_id][1][i]
+        assert got_map == map_id
+        assert (context.tolist(), masked, target) == (want_context.tolist(), want_masked, want_target)
+        assert len(dataset.cache) <= 2
+
+    neighbors = dataset.load_map(1)["neighbors"]
+    mask = dataset.load_map(1)["neighbor_mask"]
+    _, context, masked, _ = dataset[int(dataset.map_sample_offsets[1])]
+    assert masked in neighbors[context[-1]][mask[context[-1]]].tolist()
+
+
+def test_map_grouped_batches_load_each_map_once(tmp_path):
+    dataset = MultiMapPathDataset([map_dir for map_dir, _ in generated_maps(tmp_path, 5)], cache_size=2)
+    sampler = MapGroupedBatchSampler(dataset, batch_size=8, seed=3)
+    batches = list(sampler)
+    assert len(batches) == len(sampler)
+    assert sorted(i for batch in batches for i in batch) == list(range(len(dataset)))
+
+    for batch in batches:
+        map_id, context, lengths, masked, target = collate_map_batch([dataset[i] for i in batch])
+        assert context.shape[0] == len(batch) == len(masked)
+    assert dataset.loads == 5
+
+
+def test_length_bucket_sampler_shards_batches_across_ranks():
+    lengths = np.random.default_rng(0).integers(2, 40, size=1000)
+    shards = [list(LengthBucketSampler(lengths, batch_size=32, seed=4, rank=r, world_size=3)) for r in range(3)]
+    assert all(len(shard) == len(LengthBucketSampler(lengths, 32, world_size=3)) for shard in shards)
+    seen = [i for shard in shards for batch in shard for i in batch]
+    assert len(seen) == len(set(seen)) > 1000 - 3 * 32
@@ -0,0 +1,39 @@
+import random
+
+import torch
+
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.mflmt import ManueverabilityFirstLayerMapTensor
+from ai_commander.pathfinding import AStarPathfinder
+from ai_commander.PlayerPathDataset import PlayerPathDataset
+from ai_commander.quantization import accuracy_drift, load_quantized, model_size
+
+
+def path_dataset(mcg, count, seed):
+    finder = AStarPathfinder(mcg, "INF")
+    rng = random.Random(seed)
+    hex_ids = sorted(mcg["INF"])
+    paths = [finder.find_path(rng.choice(hex_ids), rng.choice(hex_ids), rng=rng, noise=0.3) for _ in range(count)]
+    return PlayerPathDataset([path for path in paths if path], mcg, unit_type="INF")
+
+
+def test_quantized_checkpoint_drift_and_size(map_data, tmp_path):
+    torch.manual_seed(0)
+    mcg = MovementCostGraphBuilder(map_data).build_graph()
+    train, held_out = path_dataset(mcg, 80, seed=1), path_dataset(mcg, 40, seed=2)
+    model = ManueverabilityFirstLayerMapTensor.from_mcg(mcg)
+    model.train_mflmt(train, epochs=3, batch_size=16, model_dir=str(tmp_path))
+
+    quantized = load_quantized(str(tmp_path / "mflmt.pt"), mcg=mcg)
+    assert model_size(quantized) < model_size(model)
+
+    drift = accuracy_drift(model, quantized, held_out)
+    assert drift["samples"] > 50
+    assert drift["top1_agreement"] > 0.9
+    assert abs(drift["reference_accuracy"] - drift["quantized_accuracy"]) < 0.05
+    assert drift["max_prob_diff"] < 0.1
+
+    path, _, goal = held_out.hex_sample(0)
+    candidates, probs = quantized(path, goal, mcg, "INF")
+    assert candidates == model(path, goal, mcg, "INF")[0]
+    assert abs(float(probs.sum()) - 1) < 1e-5
@@ -0,0 +1,49 @@
+import numpy as np
+
+from ai_commander.distance_fields import DistanceFields
+from ai_commander.mcg import MovementCostGraphBuilder
+from ai_commander.reachability import ReachabilityEngine
+
+
+def test_reach_batch_matches_distance_fields(map_data):
+    mcg = MovementCostGraphBuilder(map_data).build_compact()
+    fields = DistanceFields.build(mcg, ["INF", "ATV"])
+    engine = ReachabilityEngine(mcg)
+    queries = [
+        (unit_type, hex_id, mp)
+        for unit_type in ("INF", "ATV")
+        for hex_id in ("0101", "0505", "0910")
+        for mp in (0, 1.5, 3, 6)
+    ]
+    results = engine.reach_batch(queries)
+
+    for (unit_type, hex_id, mp), (indices, remaining) in zip(queries, results):
+        dist = fields.distances[unit_type][engine.hex_index[hex_id]]
+        expected = np.flatnonzero(dist <= mp + 1e-5)
+        assert sorted(indices.tolist()) == expected.tolist()
+        np.testing.assert_allclose(remaining, np.maximum(mp - dist[indices], 0), atol=1e-5)
+        assert indices[0] == engine.hex_index[hex_id]
+
+    bits = engine.bitsets(results)
+    assert bits.shape == (len(queries), (engine.num_hexes + 7) // 8)
+    unpacked = np.unpackbits(bits, axis=1, count=engine.num_hexes, bitorder="little").astype(bool)
+    assert np.array_equal(unpacked, engine.remaining(results) >= 0)
+
+
+def test_engine_in_caches_follows_apply_changes(map_data):
+    map_data["terrain"]["SWAMP"] = {"move_cost": {"INF": 5, "ATV": 8}}
+    builder = MovementCostGraphBuilder(map_data)
+    graph = builder.build_graph()
+    engine = ReachabilityEngine(graph)
+    before = engine.reach("INF", "0505", 4)
+
+    builder.apply_changes(
+        graph, hex_terrain={h: "SWAMP" for h in ("0405", "0504", "0506", "0604", "0605", "0406")},
+        roads_removed=list(map_data["roads"]), caches=[engine],
+    )
+    fields = DistanceFields.build(graph, ["INF"])
+    indices, remaining = engine.reach("INF", "0505", 4)
+    dist = fields.distances["INF"][fields.hex_index["0505"]]
+    expected = np.flatnonzero(dist <= 4 + 1e-5)
+    assert sorted(engine.hex_ids[i] for i in indices) == sorted(fields.hex_ids[i] for i in expected)
+    assert len(indices) < len(before[0])
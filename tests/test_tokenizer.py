@@ -0,0 +1,111 @@
+import random
+import re
+
+import numpy as np
+import pytest
+import torch
+
+from ai_commander.tokenizer import Wb95Tokenizer
+from ai_commander.tools.vocab_builder import build_vocab_file
+
+COMMANDS = [
+    "<1_1_17/2/2/2><2371><MOVE><1_1_17/2/2/1><2372>",
+    "<2_2_10/3/1/3><1945><move><2_2_10/3/1/2><2045>",
+    "<3_1_7/2/3/4><2210><DIGIN><3_1_7/2/3/3><2210><0101>",
+    "<A_b_7/x/3/4><><HQ!><²³><Ωmega><<1_2_3/4/5/6>",
+]
+
+
+def reference_tokenize(command):
+    """The original two-step tokenizer, kept to check the compiled grammar against"""
+    tokens = []
+    for i, part in enumerate(re.findall(r"<(.*?)>", command)):
+        if "/" in part and "_" in part:
+            company, battalion, regiment = part.split("/")[0].split("_")
+            strength, manuever, movement = part.split("/")[1:]
+            tokens.extend([f"COM_{company}", f"BAT_{battalion}", f"REG_{regiment}",
+                           f"STR_{strength}", f"MAN_{manuever}", f"MOV_{movement}"])
+        elif part.isdigit():
+            tokens.append(f"HEX_START_{part}" if i == 1 else f"HEX_END_{part}" if i == 4 else f"HEX_{part}")
+        elif part.isalpha():
+            tokens.append(f"ACTION_{part.upper()}")
+        else:
+            tokens.append(part)
+    return tokens
+
+
+def outcome(tokenize, command):
+    try:
+        return tokenize(command)
+    except ValueError as error:
+        return type(error)
+
+
+def test_tokenize_matches_reference_grammar():
+    tokenizer = Wb95Tokenizer()
+    for command in COMMANDS:
+        assert tokenizer.tokenize(command) == reference_tokenize(command)
+
+    rng = random.Random(0)
+    alphabet = "<>/_\n0123456789aZ²Ω "
+    for _ in range(5000):
+        command = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert outcome(tokenizer.tokenize, command) == outcome(reference_tokenize, command)
+
+    def field():
+        return "".join(rng.choice("0123456789aZ²_/ ") for _ in range(rng.choice([0, 1, 1, 2, 3])))
+
+    for _ in range(5000):
+        unit = "<{}_{}_{}/{}/{}/{}>".format(*(field() for _ in range(6)))
+        command = f"{unit}<{field()}><{field()}>{unit}<{field()}>"
+        assert outcome(tokenizer.tokenize, command) == outcome(reference_tokenize, command)
+
+
+@pytest.fixture
+def tokenizer():
+    tokenizer = Wb95Tokenizer()
+    tokens = sorted({token for command in COMMANDS[:3] for token in reference_tokenize(command)})
+    tokenizer.vocab = {"<PAD>": 0, "<UNK>": 1, **{token: i for i, token in enumerate(tokens, start=2)}}
+    return tokenizer
+
+
+def test_batch_encode_matches_single_commands(tokenizer):
+    batch = tokenizer.batch_encode(COMMANDS, return_tensors="np")
+    assert batch["input_ids"].dtype == np.int32
+    for row, command in enumerate(COMMANDS):
+        ids = tokenizer.convert_tokens_to_ids(tokenizer.tokenize(command))
+        assert batch["input_ids"][row, :len(ids)].tolist() == ids
+        assert batch["attention_mask"][row].sum() == len(ids)
+        assert (batch["input_ids"][row, len(ids):] == 0).all()
+
+    padded = tokenizer.batch_encode(COMMANDS[:2], max_length=20, padding="max_length")
+    assert isinstance(padded["input_ids"], torch.Tensor)
+    assert padded["input_ids"].shape == (2, 20)
+    truncated = tokenizer.batch_encode(COMMANDS, max_length=5, return_tensors="np")
+    assert truncated["input_ids"].shape == (4, 5)
+    assert truncated["attention_mask"].all()
+
+    fixed = tokenizer.batch_encode((c for c in COMMANDS), max_length=5, padding="max_length", return_tensors="np")
+    assert fixed["input_ids"].tolist() == truncated["input_ids"].tolist()
+    assert fixed["attention_mask"].tolist() == truncated["attention_mask"].tolist()
+
+
+def test_factorized_tokens_round_trip(tmp_path):
+    commands = COMMANDS[:3] + [
+        f"<{c}_{b}_{r}/2/2/2><{col:02}{row:02}><MOVE><{c}_{b}_{r}/2/2/1><{col:02}{row + 1:02}>"
+        for c, b, r in ((1, 1, 17), (2, 3, 9)) for col in range(1, 41, 3) for row in range(1, 71, 5)
+    ]
+    source = tmp_path / "commands.txt"
+    source.write_text("\n".join(commands), encoding="utf-8")
+    plain_vocab = build_vocab_file(str(source), str(tmp_path / "plain.json"))
+    factorized_vocab = build_vocab_file(str(source), str(tmp_path / "factorized.json"), factorized=True)
+    assert len(factorized_vocab) < len(plain_vocab) / 3
+
+    plain = Wb95Tokenizer(str(tmp_path / "plain.json"))
+    factorized = Wb95Tokenizer.from_pretrained(str(tmp_path / "factorized.json"), factorized=True)
+    assert factorized.tokenize(COMMANDS[0])[:8] == ["COM", "NUM_1", "BAT", "NUM_1", "REG", "NUM_17", "STR_2", "MAN_2"]
+    assert factorized.tokenize(COMMANDS[0])[9:12] == ["HEX_START", "COL_23", "ROW_71"]
+    for command in commands:
+        assert factorized.decode(factorized(command)["input_ids"]) == plain.decode(plain(command)["input_ids"])
+    for command in commands + [COMMANDS[3]]:
+        assert Wb95Tokenizer.join_factorized(factorized.tokenize(command)) == plain.tokenize(command)
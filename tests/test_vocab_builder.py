@@ -0,0 +1,32 @@
+from collections import Counter
+
+from ai_commander.tokenizer import Wb95Tokenizer
+from ai_commander.tools.vocab_builder import build_vocab, build_vocab_file, count_tokens
+
+SOURCE = "tests/sources/example_wb95_commands.txt"
+
+
+def test_counts_merge_across_files_and_workers(tmp_path):
+    tokenizer = Wb95Tokenizer()
+    with open(SOURCE, encoding="utf-8") as f:
+        commands = [line.strip() for line in f if line.strip()]
+    expected = Counter(token for command in commands for token in tokenizer.tokenize(command))
+
+    assert count_tokens(SOURCE, chunk_lines=2) == expected
+    doubled = Counter({token: 2 * count for token, count in expected.items()})
+    assert count_tokens([SOURCE, SOURCE], workers=2, chunk_lines=1) == doubled
+
+
+def test_vocab_is_frequency_ordered_and_capped(tmp_path):
+    counts = Counter({"ACTION_MOVE": 5, "HEX_0101": 1, "COM_1": 5, "BAT_2": 3})
+    vocab = build_vocab(counts)
+    assert list(vocab) == ["<PAD>", "<UNK>", "ACTION_MOVE", "COM_1", "BAT_2", "HEX_0101"]
+    assert list(vocab.values()) == list(range(6))
+    assert list(build_vocab(counts, min_count=2)) == ["<PAD>", "<UNK>", "ACTION_MOVE", "COM_1", "BAT_2"]
+    assert list(build_vocab(counts, max_size=3)) == ["<PAD>", "<UNK>", "ACTION_MOVE"]
+
+    vocab_path = str(tmp_path / "vocab.json")
+    vocab = build_vocab_file(SOURCE, vocab_path, min_count=2)
+    tokenizer = Wb95Tokenizer(vocab_path)
+    assert tokenizer.vocab == vocab
+    assert "<UNK>" in tokenizer.decode(tokenizer("<9_9_9/9/9/9><9999><FLY><9_9_9/9/9/9><9998>")["input_ids"])